@@ -26,7 +26,7 @@ def is_blender_5():
 
 import bpy
 from bpy.types import AddonPreferences
-from bpy.props import StringProperty, BoolProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty
 
 # Reload modules for development
 if "bpy" in locals():
@@ -63,9 +63,12 @@ if "bpy" in locals():
         importlib.reload(updater)
     if "history_previews" in locals():
         importlib.reload(history_previews)
+    if "result_cache" in locals():
+        importlib.reload(result_cache)
 
 # Import our modules
 from . import log
+from .log import logger
 from . import credentials
 from . import ui_panel
 from . import operators
@@ -81,6 +84,7 @@ from . import texture_pipeline
 from . import texture_operators
 from . import updater
 from . import history_previews
+from . import result_cache
 
 def get_hwid_stable() -> str:
     """Generate a stable 16-char Hardware ID hash based on MAC address."""
@@ -89,6 +93,9 @@ def get_hwid_stable() -> str:
     mac = str(uuid.getnode()).encode('utf-8')
     return hashlib.sha256(mac).hexdigest()[:16]
 
+def _on_verbose_logging_update(self, context):
+    log.set_verbose(self.verbose_logging)
+
 class NanoBananaPreferences(AddonPreferences):
     bl_idname = __name__
 
@@ -111,6 +118,21 @@ class NanoBananaPreferences(AddonPreferences):
         options={'HIDDEN'},
     )
 
+    max_render_history: IntProperty(
+        name="Render History Size",
+        description="Renders kept in the gallery. Older renders and their images are freed",
+        default=threading_utils.MAX_RENDER_HISTORY,
+        min=1,
+        max=200,
+    )
+
+    verbose_logging: BoolProperty(
+        name="Verbose Logging",
+        description="Print debug diagnostics to the system console",
+        default=False,
+        update=_on_verbose_logging_update,
+    )
+
     # Account info display — show email on logged-in state
     def draw(self, context):
         layout = self.layout
@@ -170,6 +192,9 @@ class NanoBananaPreferences(AddonPreferences):
         box = layout.box()
         box.label(text="Privacy & Data Collection:", icon='LOCKED')
         box.prop(self, "eu_format")
+        
+        layout.prop(self, "max_render_history")
+        layout.prop(self, "verbose_logging")
 
 
 # Registration - Core classes first
@@ -187,6 +212,7 @@ core_classes = (
     operators.GeminiOTStopRender,
     operators.GeminiOTLoadHistory,
     operators.GeminiOTDeleteHistory,
+    operators.GeminiOTHistoryPage,
     operators.GeminiOTUseHistoryPrompt,
     operators.GeminiOTUseHistoryStyle,
     operators.GeminiOTUseHistoryBoth,
@@ -210,6 +236,7 @@ core_classes = (
     texture_operators.BananaOTPreviewTexCamera,
     texture_operators.BananaOTTextureDraft,
     texture_operators.BananaOTTextureEnhance,
+    texture_operators.BananaOTCancelTex,
     texture_operators.BananaOTCleanupTex,
     texture_operators.BananaOTClearTexReference,
     texture_operators.BananaOTLoadTexReference,
@@ -224,16 +251,16 @@ def register():
     # Register render engine first
     try:
         render_engine.register()
-        print("[NANO BANANA] Render engine registered")
+        logger.debug("Render engine registered")
     except Exception as e:
-        print(f"Error registering render engine: {e}")
+        logger.error("Error registering render engine: %s", e)
     
     # Register core classes
     for cls in core_classes:
         try:
             bpy.utils.register_class(cls)
         except Exception as e:
-            print(f"Error registering core class {cls}: {e}")
+            logger.error("Error registering core class %s: %s", cls, e)
     
     # Init history previews gallery
     history_previews.init_previews()
@@ -241,9 +268,9 @@ def register():
     # Register Image Editor module
     try:
         image_editor.register()
-        print("[NANO BANANA] Image Editor panel registered")
+        logger.debug("Image Editor panel registered")
     except Exception as e:
-        print(f"Warning: Could not register Image Editor: {e}")
+        logger.warning("Could not register Image Editor: %s", e)
     
     # Add properties to scene
     bpy.types.Scene.gemini_render = bpy.props.PointerProperty(type=ui_panel.GeminiRenderProperties)
@@ -259,13 +286,20 @@ def register():
     try:
         credentials.restore_credentials_on_startup()
     except Exception as e:
-        print(f"[NANO BANANA] Could not restore credentials: {e}")
+        logger.warning("Could not restore credentials: %s", e)
+
+    # Property update callbacks do not run on load, so apply the saved choice
+    prefs = bpy.context.preferences.addons.get(__name__)
+    if prefs:
+        log.set_verbose(prefs.preferences.verbose_logging)
 
     # Auto-Updater
     bpy.types.WindowManager.nanode_update_version = StringProperty(default="")
     import threading
     t = threading.Thread(target=updater.check_updates_in_background, args=(bl_info["version"], BUILD_NUMBER), daemon=True)
     t.start()
+    # Keep the AI result cache bounded without blocking startup
+    threading.Thread(target=result_cache.prune, daemon=True).start()
     if not bpy.app.timers.is_registered(updater.update_poll_timer):
         bpy.app.timers.register(updater.update_poll_timer, first_interval=3.0)
 
@@ -284,6 +318,12 @@ def unregister():
         threading_utils.stop_thread_manager()
     except Exception:
         pass
+
+    # Close pooled API connections
+    try:
+        gemini_api.close_http_session()
+    except Exception:
+        pass
         
     if bpy.app.timers.is_registered(updater.update_poll_timer):
         bpy.app.timers.unregister(updater.update_poll_timer)
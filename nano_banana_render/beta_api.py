@@ -6,6 +6,7 @@ No Google API key is stored or used on the client side.
 
 import json
 import base64
+import binascii
 from typing import Optional, Tuple
 from urllib import request as urllib_request
 from urllib.error import HTTPError, URLError
@@ -199,8 +200,8 @@ def generate(
     print(f"[BETA API] Sending generation request ({gen_type}, model={model})")
     resp = _post("/generate", data, timeout=120)
 
-    # Decode the returned image
-    image_bytes = base64.b64decode(resp["image"])
+    # Decode the returned image (a2b_base64 reads the str in place, no ASCII copy)
+    image_bytes = binascii.a2b_base64(resp.pop("image"))
     generation_id = resp.get("generation_id", 0)
     balance = resp.get("balance", 0)
 
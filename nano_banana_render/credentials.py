@@ -14,6 +14,10 @@ import bpy
 
 logger = logging.getLogger("nano_banana")
 
+# Write-through copy of the credentials file. The preferences panel reads
+# the email/name on every redraw, so only the first read touches the disk.
+_cached_credentials = None
+
 
 def get_credentials_path() -> str:
     """Get path to persistent credentials file."""
@@ -24,8 +28,10 @@ def get_credentials_path() -> str:
 
 def save_credentials_file(api_key: str, email: str, name: str) -> None:
     """Save credentials to a persistent file."""
+    global _cached_credentials
+    data = {"api_key": api_key, "email": email, "name": name}
+    _cached_credentials = dict(data)
     try:
-        data = {"api_key": api_key, "email": email, "name": name}
         with open(get_credentials_path(), "w", encoding="utf-8") as f:
             json.dump(data, f)
         logger.info("Credentials saved to %s", get_credentials_path())
@@ -35,18 +41,28 @@ def save_credentials_file(api_key: str, email: str, name: str) -> None:
 
 def load_credentials_file() -> dict:
     """Load credentials from persistent file. Returns {} if not found."""
+    global _cached_credentials
+    if _cached_credentials is not None:
+        # Copy, so callers that mutate the result cannot corrupt the cache
+        return dict(_cached_credentials)
+    data = {}
     try:
         path = get_credentials_path()
         if os.path.exists(path):
             with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+                data = json.load(f)
     except (OSError, json.JSONDecodeError) as e:
+        # Not cached: the next read retries the file
         logger.error("Failed to load credentials: %s", e)
-    return {}
+        return {}
+    _cached_credentials = data
+    return dict(data)
 
 
 def delete_credentials_file() -> None:
     """Delete the persistent credentials file."""
+    global _cached_credentials
+    _cached_credentials = {}
     try:
         path = get_credentials_path()
         if os.path.exists(path):
@@ -1,13 +1,134 @@
 import bpy
+import hashlib
 import numpy as np
 import os
+import shutil
 import tempfile
+import threading
+from collections import OrderedDict
 from typing import Optional, Tuple
 
+from .log import logger
+
+
 class DepthRenderError(Exception):
     """Custom exception for depth rendering errors"""
     pass
 
+class DepthCache:
+    """Reuses mist depth captures while camera, geometry and mist settings are unchanged.
+    Entries own their temp directories; geometry edits clear the cache via
+    the depsgraph handler (transforms are part of the key). The capture of
+    the render in flight is pinned so dropping it does not delete its files.
+    """
+    
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pinned = None
+        self._pinned_dropped = False
+    
+    @staticmethod
+    def make_key(scene, mist_start: float, mist_depth: float, mist_falloff: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        render = scene.render
+        h.update(repr((render.resolution_x, render.resolution_y, render.resolution_percentage,
+                       mist_start, mist_depth, mist_falloff)).encode())
+        cam = scene.camera
+        cam_data = cam.data
+        h.update(repr((cam.name, [tuple(row) for row in cam.matrix_world],
+                       cam_data.type, cam_data.lens, cam_data.ortho_scale,
+                       cam_data.sensor_width, cam_data.clip_start, cam_data.clip_end,
+                       cam_data.shift_x, cam_data.shift_y)).encode())
+        for obj in sorted(scene.objects, key=lambda o: o.name):
+            if obj.type in {'CAMERA', 'LIGHT'} or not obj.visible_get():
+                continue
+            data_name = obj.data.name if obj.data else ""
+            h.update(repr((obj.name, data_name, [tuple(row) for row in obj.matrix_world])).encode())
+        return h.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            path = self._entries.get(key)
+            if path is None:
+                return None
+            if not os.path.exists(path):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return path
+    
+    def put(self, key: str, path: str) -> None:
+        with self._lock:
+            self._entries[key] = path
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, stale = self._entries.popitem(last=False)
+                self._discard(stale)
+    
+    def clear(self) -> None:
+        with self._lock:
+            for path in self._entries.values():
+                self._discard(path)
+            self._entries.clear()
+    
+    def pin(self, path: Optional[str]) -> None:
+        """Keep path's files on disk until unpin(), even if its entry is dropped."""
+        with self._lock:
+            self._release_pin()
+            self._pinned = path
+    
+    def unpin(self) -> None:
+        with self._lock:
+            self._release_pin()
+    
+    def _discard(self, path: str) -> None:
+        # Caller holds the lock
+        if path == self._pinned:
+            self._pinned_dropped = True
+        else:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    
+    def _release_pin(self) -> None:
+        # Caller holds the lock
+        if self._pinned and self._pinned_dropped:
+            shutil.rmtree(os.path.dirname(self._pinned), ignore_errors=True)
+        self._pinned = None
+        self._pinned_dropped = False
+
+
+depth_cache = DepthCache()
+
+
+def prepare_depth_for_upload(depth_path: str, max_dim: int) -> str:
+    """Write an 8-bit grayscale copy of a depth map, longest side capped at max_dim.
+    The mist capture is a full-resolution 16-bit PNG; the model only sees 8 bits
+    and rescales anyway, so this mainly shrinks the upload. Returns the original
+    path when PIL is unavailable or nothing would change.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return depth_path
+    
+    upload_path = os.path.join(os.path.dirname(depth_path), f"upload_{max_dim}.png")
+    if os.path.exists(upload_path):
+        return upload_path  # Cached capture already prepared at this size
+    
+    with Image.open(depth_path) as img:
+        if img.mode == 'L' and max(img.size) <= max_dim:
+            return depth_path
+        if img.mode.startswith('I'):
+            # 16-bit samples: keep the high byte (convert('L') would clip, not scale)
+            gray = Image.fromarray(np.right_shift(np.asarray(img), 8).astype(np.uint8), 'L')
+        else:
+            gray = img.convert('L')
+    gray.thumbnail((max_dim, max_dim), Image.BILINEAR)
+    gray.save(upload_path, 'PNG')
+    return upload_path
+
+
 class DepthRenderer:
     """Handles depth map rendering and normalization"""
     
@@ -17,7 +138,7 @@ class DepthRenderer:
     
     def cleanup_temp_files(self):
         """Clean up temporary files AND directories completely"""
-        print("[GEMINI] Starting cleanup of temporary files and directories...")
+        logger.debug("Starting cleanup of temporary files and directories...")
         
         # Clean up individual files
         files_cleaned = 0
@@ -26,9 +147,9 @@ class DepthRenderer:
                 if os.path.exists(filepath):
                     os.remove(filepath)
                     files_cleaned += 1
-                    print(f"[GEMINI] Removed temp file: {os.path.basename(filepath)}")
+                    logger.debug("Removed temp file: %s", os.path.basename(filepath))
             except Exception as e:
-                print(f"[GEMINI] Could not remove temp file {filepath}: {e}")
+                logger.warning("Could not remove temp file %s: %s", filepath, e)
         
         # Clean up temporary directories (with all contents)
         dirs_cleaned = 0
@@ -38,15 +159,15 @@ class DepthRenderer:
                     import shutil
                     shutil.rmtree(temp_dir)
                     dirs_cleaned += 1
-                    print(f"[GEMINI] Removed temp directory: {os.path.basename(temp_dir)}")
+                    logger.debug("Removed temp directory: %s", os.path.basename(temp_dir))
             except Exception as e:
-                print(f"[GEMINI] Could not remove temp directory {temp_dir}: {e}")
+                logger.warning("Could not remove temp directory %s: %s", temp_dir, e)
         
         # Clear tracking lists
         self.temp_files.clear()
         self.temp_dirs.clear()
         
-        print(f"[GEMINI] Cleanup completed: {files_cleaned} files, {dirs_cleaned} directories removed")
+        logger.info("Cleanup completed: %s files, %s directories removed", files_cleaned, dirs_cleaned)
     
     
     def validate_scene(self, scene) -> None:
@@ -62,7 +183,7 @@ class DepthRenderer:
         
         # Check render engine supports Z pass
         if scene.render.engine not in ['CYCLES', 'BLENDER_EEVEE', 'BLENDER_EEVEE_NEXT']:
-            print(f"Warning: Render engine {scene.render.engine} may not support depth pass properly")
+            logger.warning("Render engine %s may not support depth pass properly", scene.render.engine)
     
     def render_depth_map_mist(self, scene, mist_start: float = 5.0, mist_depth: float = 25.0, mist_falloff: str = 'LINEAR') -> str:
         """
@@ -71,14 +192,14 @@ class DepthRenderer:
         try:
             # Validate scene
             self.validate_scene(scene)
-            print("[GEMINI] Scene validation passed")
+            logger.debug("Scene validation passed")
             
             # Create temporary directory for output
             temp_dir = tempfile.mkdtemp(prefix="gemini_depth_mist_")
             depth_path = os.path.join(temp_dir, "mist_depth.png")
             self.temp_files.append(depth_path)
             self.temp_dirs.append(temp_dir)  # Track directory for cleanup
-            print(f"[GEMINI] Created temp directory: {temp_dir}")
+            logger.debug("Created temp directory: %s", temp_dir)
             
             import bpy
             
@@ -93,7 +214,7 @@ class DepthRenderer:
             original_use_nodes = scene.use_nodes
             
             try:
-                print("[GEMINI] Setting up Mist Pass for depth rendering...")
+                logger.debug("Setting up Mist Pass for depth rendering...")
                 
                 # Setup World mist settings
                 world = scene.world
@@ -101,7 +222,7 @@ class DepthRenderer:
                     # Create world if it doesn't exist
                     world = bpy.data.worlds.new("TempWorld")
                     scene.world = world
-                    print("[GEMINI] Created temporary world")
+                    logger.debug("Created temporary world")
                 
                 # Store original world settings (Blender 4.5+ uses mist_settings)
                 if hasattr(world, 'mist_settings') and world.mist_settings:
@@ -117,7 +238,7 @@ class DepthRenderer:
                     mist_settings.depth = mist_depth  # Already in meters 
                     mist_settings.falloff = mist_falloff  # Use user-selected falloff
                     
-                    print(f"[GEMINI] Mist settings (4.5+ API): start={mist_settings.start}m, depth={mist_settings.depth}m, falloff={mist_falloff}")
+                    logger.debug("Mist settings (4.5+ API): start=%sm, depth=%sm, falloff=%s", mist_settings.start, mist_settings.depth, mist_falloff)
                 else:
                     # Fallback for older Blender versions
                     original_use_mist = getattr(world, 'use_mist', False)
@@ -131,7 +252,7 @@ class DepthRenderer:
                     setattr(world, 'mist_depth', mist_depth)  # Already in meters
                     setattr(world, 'mist_falloff', mist_falloff)  # Use user-selected falloff
                     
-                    print(f"[GEMINI] Mist settings (legacy API): start={mist_start}m, depth={mist_depth}m, falloff={mist_falloff}")
+                    logger.debug("Mist settings (legacy API): start=%sm, depth=%sm, falloff=%s", mist_start, mist_depth, mist_falloff)
                 
                 # Use Eevee Next for fast rendering with Mist Pass support (Blender 4.5+)
                 available_engines = ['BLENDER_EEVEE_NEXT', 'BLENDER_EEVEE', 'CYCLES', 'BLENDER_WORKBENCH']
@@ -141,7 +262,7 @@ class DepthRenderer:
                     try:
                         scene.render.engine = engine
                         selected_engine = engine
-                        print(f"[GEMINI] Using render engine: {engine}")
+                        logger.debug("Using render engine: %s", engine)
                         break
                     except TypeError:
                         continue
@@ -157,16 +278,16 @@ class DepthRenderer:
                     
                     if hasattr(view_layer, 'use_pass_mist'):
                         view_layer.use_pass_mist = True
-                        print("[GEMINI] Mist pass enabled in view layer")
+                        logger.debug("Mist pass enabled in view layer")
                         
                         # Disable Combined pass for pure mist render
                         if hasattr(view_layer, 'use_pass_combined'):
                             view_layer.use_pass_combined = False
-                            print("[GEMINI] Combined pass disabled - pure mist only")
+                            logger.debug("Combined pass disabled - pure mist only")
                     else:
-                        print("[GEMINI] Warning: View layer found but no mist pass support")
+                        logger.warning("View layer found but no mist pass support")
                 else:
-                    print("[GEMINI] Warning: No view layer found, continuing without mist pass")
+                    logger.warning("No view layer found, continuing without mist pass")
                     original_use_pass_mist = False
                     original_use_pass_combined = True
                 
@@ -219,10 +340,10 @@ class DepthRenderer:
                 # Restore render engine
                 scene.render.engine = original_render_engine
                 
-                print("[GEMINI] World and render settings restored")
+                logger.debug("World and render settings restored")
                 
         except Exception as e:
-            print(f"[GEMINI] Mist depth render error: {str(e)}")
+            logger.error("Mist depth render error: %s", e)
             # CRITICAL: Only cleanup on error!
             self.cleanup_temp_files()
             if isinstance(e, DepthRenderError):
@@ -254,7 +375,7 @@ class DepthRenderer:
             pass
             
         # Method 4: Create view layer if none exist (extreme fallback)
-        print("[GEMINI] Warning: No view layer found, using scene fallback")
+        logger.warning("No view layer found, using scene fallback")
         return None
     
 
@@ -263,7 +384,7 @@ class DepthRenderer:
         try:
             import bpy
             
-            print("[GEMINI] Setting up VIEWPORT mist render from camera...")
+            logger.debug("Setting up VIEWPORT mist render from camera...")
             
             # Store original settings
             original_filepath = scene.render.filepath
@@ -300,7 +421,7 @@ class DepthRenderer:
                         break
                 
                 if not viewport_area:
-                    print("[GEMINI] No 3D viewport found, creating temporary context")
+                    logger.debug("No 3D viewport found, creating temporary context")
                     # Fallback if no viewport found
                     raise DepthRenderError("No 3D viewport available for mist render")
                 
@@ -349,12 +470,12 @@ class DepthRenderer:
                             }
                         break
                 
-                print(f"[GEMINI] Original viewport shading: {original_shading_type}")
+                logger.debug("Original viewport shading: %s", original_shading_type)
                 
                 # CRITICAL: Switch viewport to CAMERA VIEW
                 if space_data.region_3d:
                     space_data.region_3d.view_perspective = 'CAMERA'
-                    print("[GEMINI] Switched viewport to CAMERA VIEW")
+                    logger.debug("Switched viewport to CAMERA VIEW")
                 
                 # CRITICAL: Set viewport to MATERIAL shading with MIST pass!
                 space_data.shading.type = 'MATERIAL'
@@ -362,29 +483,29 @@ class DepthRenderer:
                 # CRITICAL: Set render pass to MIST (this is what shows mist!)
                 if hasattr(space_data.shading, 'render_pass'):
                     space_data.shading.render_pass = 'MIST'
-                    print("[GEMINI] Set viewport render_pass to MIST!")
+                    logger.debug("Set viewport render_pass to MIST!")
                 else:
-                    print("[GEMINI] WARNING: render_pass not available in shading")
+                    logger.warning("render_pass not available in shading")
                 
                 # Enable scene world (for mist to work)
                 if hasattr(space_data.shading, 'use_scene_world'):
                     space_data.shading.use_scene_world = True
-                    print("[GEMINI] Enabled use_scene_world for mist")
+                    logger.debug("Enabled use_scene_world for mist")
                 
                 # CRITICAL: DISABLE ALL OVERLAYS (grid, axes, text, gizmos, etc.)
                 if hasattr(overlay, 'show_overlays'):
                     overlay.show_overlays = False
-                    print("[GEMINI] DISABLED all overlays")
+                    logger.debug("DISABLED all overlays")
                 
                 # Disable gizmos
                 if hasattr(space_data, 'show_gizmo'):
                     space_data.show_gizmo = False
-                    print("[GEMINI] DISABLED gizmos")
+                    logger.debug("DISABLED gizmos")
                 if hasattr(space_data, 'show_gizmo_navigate'):
                     space_data.show_gizmo_navigate = False
-                    print("[GEMINI] DISABLED gizmo navigate")
+                    logger.debug("DISABLED gizmo navigate")
                 
-                print("[GEMINI] Viewport configured for clean camera mist rendering (no overlays)")
+                logger.debug("Viewport configured for clean camera mist rendering (no overlays)")
                 
                 # Set render output
                 scene.render.filepath = mist_output_path
@@ -392,7 +513,7 @@ class DepthRenderer:
                 scene.render.image_settings.color_mode = 'BW'
                 scene.render.image_settings.color_depth = '16'
                 
-                print("[GEMINI] Starting viewport render with mist from camera...")
+                logger.debug("Starting viewport render with mist from camera...")
                 
                 # Execute viewport render
                 override_context = {
@@ -406,13 +527,13 @@ class DepthRenderer:
                 
                 with bpy.context.temp_override(**override_context):
                     result = bpy.ops.render.opengl(write_still=True)
-                    print(f"[GEMINI] OpenGL mist render result: {result}")
+                    logger.debug("OpenGL mist render result: %s", result)
                 
-                print("[GEMINI] Viewport mist render completed")
+                logger.debug("Viewport mist render completed")
                 
                 # Find output file
                 if os.path.exists(mist_output_path):
-                    print(f"[GEMINI] Viewport mist saved: {mist_output_path}")
+                    logger.info("Viewport mist saved: %s", mist_output_path)
                     return mist_output_path
                 else:
                     # Try with numbering
@@ -422,7 +543,7 @@ class DepthRenderer:
                     
                     if viewport_files:
                         actual_path = viewport_files[0]
-                        print(f"[GEMINI] Found viewport mist: {actual_path}")
+                        logger.debug("Found viewport mist: %s", actual_path)
                         return actual_path
                     else:
                         raise DepthRenderError("Viewport mist output not found after render")
@@ -462,9 +583,9 @@ class DepthRenderer:
                         if original_region_3d and space_data.region_3d:
                             space_data.region_3d.view_perspective = original_region_3d['view_perspective']
                         
-                        print("[GEMINI] Viewport settings restored (overlays, gizmos, camera view)")
+                        logger.debug("Viewport settings restored (overlays, gizmos, camera view)")
                     except Exception as e:
-                        print(f"[GEMINI] Error restoring viewport: {e}")
+                        logger.error("Error restoring viewport: %s", e)
                 
                 # Restore render filepath
                 scene.render.filepath = original_filepath
@@ -481,14 +602,14 @@ class DepthRenderer:
         try:
             # Validate scene
             self.validate_scene(scene)
-            print("[GEMINI] Scene validation passed for regular render")
+            logger.debug("Scene validation passed for regular render")
             
             # Create temporary directory for output
             temp_dir = tempfile.mkdtemp(prefix="gemini_regular_render_")
             render_path = os.path.join(temp_dir, "regular_render.png")
             self.temp_files.append(render_path)
             self.temp_dirs.append(temp_dir)
-            print(f"[GEMINI] Created temp directory: {temp_dir}")
+            logger.debug("Created temp directory: %s", temp_dir)
             
             import bpy
             
@@ -507,7 +628,7 @@ class DepthRenderer:
             original_gamma = scene.view_settings.gamma
             
             try:
-                print("[GEMINI] Setting up regular render...")
+                logger.debug("Setting up regular render...")
                 
                 # Detect available Eevee engine (Blender 5.0 uses BLENDER_EEVEE_NEXT, 4.5 uses BLENDER_EEVEE)
                 import bpy
@@ -526,33 +647,33 @@ class DepthRenderer:
                 
                 # Keep current engine or use available Eevee
                 if scene.render.engine == 'CYCLES':
-                    print("[GEMINI] Using CYCLES (current engine)")
+                    logger.debug("Using CYCLES (current engine)")
                     # Store Cycles samples
                     if hasattr(scene.cycles, 'samples'):
                         original_samples = scene.cycles.samples
                         # Use current samples or ensure minimum quality
                         if scene.cycles.samples < 64:
                             scene.cycles.samples = 64
-                            print("[GEMINI] Increased Cycles samples to 64 for quality")
+                            logger.debug("Increased Cycles samples to 64 for quality")
                 elif scene.render.engine in ['BLENDER_EEVEE_NEXT', 'BLENDER_EEVEE']:
-                    print(f"[GEMINI] Using {scene.render.engine} (current engine)")
+                    logger.debug("Using %s (current engine)", scene.render.engine)
                     # Ensure good quality for Eevee
                     if hasattr(scene.eevee, 'taa_render_samples'):
                         original_samples = scene.eevee.taa_render_samples
                         if scene.eevee.taa_render_samples < 64:
                             scene.eevee.taa_render_samples = 64
-                            print("[GEMINI] Increased Eevee samples to 64 for quality")
+                            logger.debug("Increased Eevee samples to 64 for quality")
                 else:
                     # Switch to available Eevee engine
                     scene.render.engine = available_eevee
-                    print(f"[GEMINI] Switched to {available_eevee}")
+                    logger.debug("Switched to %s", available_eevee)
                     
                     # Ensure good quality
                     if hasattr(scene.eevee, 'taa_render_samples'):
                         original_samples = scene.eevee.taa_render_samples
                         if scene.eevee.taa_render_samples < 64:
                             scene.eevee.taa_render_samples = 64
-                            print("[GEMINI] Set Eevee samples to 64 for quality")
+                            logger.debug("Set Eevee samples to 64 for quality")
                 
                 # Configure render output for viewport-like rendering (RGB, no alpha)
                 scene.render.filepath = render_path
@@ -568,14 +689,14 @@ class DepthRenderer:
                 # scene.view_settings.exposure = 0.0
                 # scene.view_settings.gamma = 1.0
                 
-                print(f"[GEMINI] Render settings: {scene.render.engine}, color_mode=RGB, view_transform=Standard, resolution={scene.render.resolution_x}x{scene.render.resolution_y}")
+                logger.debug("Render settings: %s, color_mode=RGB, view_transform=Standard, resolution=%sx%s", scene.render.engine, scene.render.resolution_x, scene.render.resolution_y)
                 
                 # Ensure render resolution is good
-                print(f"[GEMINI] Resolution: {scene.render.resolution_x}x{scene.render.resolution_y} @ {scene.render.resolution_percentage}%")
+                logger.debug("Resolution: %sx%s @ %s%%", scene.render.resolution_x, scene.render.resolution_y, scene.render.resolution_percentage)
                 
                 # Execute render
                 # Execute viewport/OpenGL render instead of regular render to avoid infinite engine loop
-                print("[GEMINI] Starting regular Eevee viewport render...")
+                logger.debug("Starting regular Eevee viewport render...")
                 
                 # Find viewport area, window, screen to render from
                 viewport_window = None
@@ -647,7 +768,7 @@ class DepthRenderer:
                     
                     with bpy.context.temp_override(**override_context):
                         result = bpy.ops.render.opengl(write_still=True)
-                        print(f"[GEMINI] OpenGL EEVEE render result: {result}")
+                        logger.debug("OpenGL EEVEE render result: %s", result)
                         
                 finally:
                     # Restore viewport settings
@@ -666,7 +787,7 @@ class DepthRenderer:
                     if original_region_3d and space_data.region_3d:
                         space_data.region_3d.view_perspective = original_region_3d['view_perspective']
                 
-                print(f"[GEMINI] Regular viewport render completed: {render_path}")
+                logger.info("Regular viewport render completed: %s", render_path)
                 
                 # Check for image
                 if not os.path.exists(render_path):
@@ -679,7 +800,7 @@ class DepthRenderer:
                     else:
                         raise DepthRenderError("Render file not created.")
                 
-                print(f"[GEMINI] Render file size: {os.path.getsize(render_path)} bytes")
+                logger.debug("Render file size: %s bytes", os.path.getsize(render_path))
                 
                 return render_path
                 
@@ -704,7 +825,7 @@ class DepthRenderer:
                     elif hasattr(scene.eevee, 'taa_render_samples'):
                         scene.eevee.taa_render_samples = original_samples
                 
-                print("[GEMINI] Restored original render settings and color management")
+                logger.debug("Restored original render settings and color management")
                 
         except Exception as e:
             raise DepthRenderError(f"Regular render failed: {str(e)}")
@@ -1,9 +1,16 @@
 """Gemini API integration for image generation using official Python SDK"""
 
 import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
 from io import BytesIO
 
+from .log import logger
+
 # Try importing PIL
 try:
     from PIL import Image
@@ -11,16 +18,139 @@ try:
 except ImportError:
     PIL_AVAILABLE = False
 
+# orjson serializes the multi-MB base64 request body much faster (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 try:
     from google import genai
     from google.genai import types
     GENAI_AVAILABLE = True
 except ImportError:
     GENAI_AVAILABLE = False
-    import requests
+
+# Always needed: cancellable requests go over REST even when the SDK is installed
+import requests
+from urllib3 import HTTPSConnectionPool
 
 
 MIME_PNG = "image/png"
+MIME_JPEG = "image/jpeg"
+MIME_WEBP = "image/webp"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _sniff_image_mime(data: bytes) -> str:
+    """MIME type from the file signature; references are sent as stored, not re-encoded."""
+    if data[:2] == b"\xff\xd8":
+        return MIME_JPEG
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return MIME_WEBP
+    return MIME_PNG
+
+# One long-lived worker for background uploads instead of a new thread per render
+_background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gemini-api")
+
+
+def _max_concurrency() -> int:
+    try:
+        return max(1, int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4")))
+    except ValueError:
+        return 4
+
+# Renders, edits and texture jobs share one cap on in-flight API calls
+_api_slots = threading.BoundedSemaphore(_max_concurrency())
+
+# Keep-alive connections shared by every render so only the first call pays the TLS handshake
+_http_session = None
+_sdk_clients = {}
+_client_lock = threading.Lock()
+
+
+# Connections checked out by the current thread's cancellable request, if any
+_tracked_conns = threading.local()
+
+
+class _TrackedHTTPSConnectionPool(HTTPSConnectionPool):
+    """Pool that records the connections a cancellable request uses, so the
+    cancel watcher can shut their sockets down mid-request."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        conns = getattr(_tracked_conns, 'conns', None)
+        if conns is not None:
+            conns.append(conn)
+        return conn
+
+
+# One watcher per in-flight cancellable request; _api_slots caps how many there are
+_cancel_watchers = ThreadPoolExecutor(max_workers=_max_concurrency(), thread_name_prefix="gemini-cancel")
+
+
+def _abort_on_cancel(cancel_event: threading.Event, done: threading.Event, conns: list) -> None:
+    """Wait for cancel_event, then shut down the request's sockets until it returns."""
+    while not done.is_set():
+        if cancel_event.wait(0.25):
+            break
+    while not done.is_set():
+        for conn in list(conns):
+            sock = getattr(conn, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        # Repeat in case the request was still connecting on the first pass
+        done.wait(0.25)
+
+
+def _get_http_session():
+    """Return the shared REST session, creating it on first use."""
+    global _http_session
+    with _client_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=_max_concurrency())
+            pool_classes = adapter.poolmanager.pool_classes_by_scheme
+            adapter.poolmanager.pool_classes_by_scheme = {**pool_classes, "https": _TrackedHTTPSConnectionPool}
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def _get_sdk_client(api_key: str):
+    """Return the SDK client for api_key, reusing its connection pool across calls."""
+    with _client_lock:
+        client = _sdk_clients.get(api_key)
+        if client is None:
+            genai.configure(api_key=api_key)
+            client = _sdk_clients[api_key] = genai.Client()
+        return client
+
+
+def close_http_session():
+    """Drop pooled connections (call on addon unregister)."""
+    global _http_session
+    with _client_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+        _sdk_clients.clear()
+
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+
+
+def _retry_delay(response, attempt: int) -> float:
+    """Honor Retry-After when the server sends one, else jittered exponential backoff."""
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(float(retry_after), 60.0)
+    return min(2.0 ** attempt, 30.0) * random.uniform(0.5, 1.5)
 
 
 def _calculate_aspect_ratio(w: int, h: int) -> str:
@@ -49,12 +179,85 @@ def _determine_resolution(w: int, h: int) -> str:
     return "1K"
 
 import json
+import re
 import base64
+import binascii
+import secrets
+
+
+class _InlineBlobs(list):
+    """Image payloads for one request body. The random nonce keeps the splice
+    markers from matching anything in user-supplied text such as the prompt."""
+
+    def __init__(self):
+        super().__init__()
+        self.nonce = secrets.token_hex(8)
+        self.marker_re = re.compile(rb'@@nb_b64_' + self.nonce.encode('ascii') + rb'_(\d+)@@')
+
+
+def _inline_image(blobs: _InlineBlobs, data: bytes) -> dict:
+    """Build an inline_data part whose payload is spliced in by _dumps_body."""
+    blobs.append(data)
+    marker = f"@@nb_b64_{blobs.nonce}_{len(blobs) - 1}@@"
+    return {"inline_data": {"mime_type": _sniff_image_mime(data), "data": marker}}
+
+
+def _dumps_body(payload: dict, blobs: Optional[_InlineBlobs] = None) -> bytes:
+    """Serialize a REST payload to a compact JSON request body.
+    Image parts made by _inline_image are base64-encoded straight into the
+    body, so the multi-MB data is never turned into a str or scanned by the
+    JSON encoder."""
+    if ORJSON_AVAILABLE:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    if not blobs:
+        return body
+    pieces = blobs.marker_re.split(body)
+    # split() alternates text, marker index, text, ...
+    for i in range(1, len(pieces), 2):
+        pieces[i] = binascii.b2a_base64(blobs[int(pieces[i])], newline=False)
+    return b"".join(pieces)
+
+
+def _loads_body(raw: bytes) -> dict:
+    """Parse a JSON response straight from its raw bytes (skips the str decode copy)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _decode_image_b64(data) -> bytes:
+    """Decode a base64 image field. Unlike base64.b64decode, a2b_base64 reads
+    ASCII str input in place instead of first encoding a full bytes copy."""
+    return binascii.a2b_base64(data)
+
 
 class GeminiAPIError(Exception):
     """Custom exception for Gemini API errors"""
     pass
 
+class GeminiCancelledError(GeminiAPIError):
+    """Raised when a request is abandoned because its cancel_event was set"""
+    pass
+
+
+def _check_cancelled(cancel_event: Optional[threading.Event]) -> None:
+    if cancel_event is not None and cancel_event.is_set():
+        raise GeminiCancelledError("Request cancelled")
+
+
+def _acquire_slot(cancel_event: Optional[threading.Event]) -> None:
+    """Wait for a free API slot, giving up early if the caller cancels."""
+    if cancel_event is None:
+        _api_slots.acquire()
+        return
+    while not _api_slots.acquire(timeout=0.5):
+        _check_cancelled(cancel_event)
+    if cancel_event.is_set():
+        _api_slots.release()
+        _check_cancelled(cancel_event)
+
 class GeminiAPI:
     """Client for Google Gemini API with official SDK"""
     
@@ -65,12 +268,12 @@ class GeminiAPI:
         
         if GENAI_AVAILABLE and PIL_AVAILABLE:
             try:
-                genai.configure(api_key=api_key)
-                self.client = genai.Client()
+                self.client = _get_sdk_client(api_key)
                 self.model = self._model_name
                 self.use_sdk = True
+                self._setup_rest()
             except Exception as e:
-                print(f"[GEMINI] SDK setup failed: {e}, falling back to REST")
+                logger.warning("SDK setup failed: %s, falling back to REST", e)
                 self.use_sdk = False
                 self._setup_rest_fallback()
         else:
@@ -79,8 +282,68 @@ class GeminiAPI:
     
     def _setup_rest_fallback(self):
         """Setup REST API fallback"""
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta"
         self.model = f"models/{self._model_name}"
+        self._setup_rest()
+
+    def _setup_rest(self):
+        """Static REST request parts — built once, only contents/imageConfig change per call"""
+        self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+        self._rest_url = f"{self.base_url}/models/{self._model_name}:generateContent?key={self.api_key}"
+        self._rest_headers = {'Content-Type': 'application/json', 'X-Goog-Api-Client': 'python-blender-addon'}
+        # REST responses use camelCase keys; remember whichever spelling was seen last
+        self._inline_data_key = 'inlineData'
+        self._generation_config_base = {
+            "maxOutputTokens": 32768,
+            "candidateCount": 1,
+            "responseModalities": ["IMAGE"],
+        }
+
+    def _post_rest(self, body: bytes, cancel_event: Optional[threading.Event] = None):
+        """POST a serialized request, retrying rate-limit and server errors."""
+        for attempt in range(MAX_RETRIES + 1):
+            _check_cancelled(cancel_event)
+            response = self._post_once(body, cancel_event)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                return response
+            delay = _retry_delay(response, attempt)
+            logger.warning("API returned %s, retrying in %.1fs (%d/%d)", response.status_code, delay, attempt + 1, MAX_RETRIES)
+            if cancel_event is not None:
+                # Wake immediately on cancel instead of sleeping out the backoff
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+        _check_cancelled(cancel_event)
+        return response
+
+    def _post_once(self, body: bytes, cancel_event: Optional[threading.Event]):
+        """Send one POST. With a cancel_event, a watcher shuts the connection down
+        when it is set, so the worker is freed instead of waiting out the timeout."""
+        session = _get_http_session()
+        if cancel_event is None:
+            return session.post(self._rest_url, headers=self._rest_headers, data=body, timeout=300)
+        conns = _tracked_conns.conns = []
+        done = threading.Event()
+        _cancel_watchers.submit(_abort_on_cancel, cancel_event, done, conns)
+        try:
+            return session.post(self._rest_url, headers=self._rest_headers, data=body, timeout=300)
+        except requests.RequestException:
+            # A reset caused by our own shutdown is a cancel, not a network error
+            _check_cancelled(cancel_event)
+            raise
+        finally:
+            done.set()
+            _tracked_conns.conns = None
+    
+    def _build_rest_payload(self, parts: list, temperature: float, resolution_str: str, aspect_ratio_str: str) -> dict:
+        """Fill the per-call fields into the prebuilt generationConfig skeleton."""
+        return {
+            "contents": [{"parts": parts}],
+            "generationConfig": {
+                **self._generation_config_base,
+                "temperature": temperature,
+                "imageConfig": {"imageSize": resolution_str, "aspectRatio": aspect_ratio_str},
+            },
+        }
         
     def _build_prompt(self, user_prompt: str, has_reference: bool = False, is_color_render: bool = False) -> str:
         """Build complete prompt using structured JSON schema for token efficiency."""
@@ -257,50 +520,63 @@ class GeminiAPI:
         else:
             return base_prompt
     
-    def generate_image(self, depth_image_path: str, user_prompt: str, reference_image_path: str = None, is_color_render: bool = False, width: int = 1024, height: int = 1024) -> Tuple[bytes, str]:
+    def generate_image(self, depth_image_path: str, user_prompt: str, reference_image_path: str = None, is_color_render: bool = False, width: int = 1024, height: int = 1024, cancel_event: Optional[threading.Event] = None) -> Tuple[bytes, str]:
         """
         Generate image from depth map and prompt using official SDK
         Optionally uses reference image for style/materials
         is_color_render: True if using regular Eevee render, False for depth map (mist)
         width, height: Output resolution
+        cancel_event: when set, waiting/retrying stops and GeminiCancelledError is raised
         Returns: (image_data, format) 
         """
-        if self.use_sdk:
-            res = self._generate_with_sdk(depth_image_path, user_prompt, reference_image_path, is_color_render, width, height)
-        else:
-            res = self._generate_with_rest(depth_image_path, user_prompt, reference_image_path, is_color_render, width, height)
+        # Read each input once; the SDK, REST and log paths all share these bytes
+        try:
+            with open(depth_image_path, 'rb') as f:
+                depth_bytes = f.read()
+        except OSError as e:
+            raise GeminiAPIError(f"Could not read input image: {e}")
+        
+        reference_bytes = None
+        if reference_image_path:
+            try:
+                with open(reference_image_path, 'rb') as f:
+                    reference_bytes = f.read()
+            except OSError as e:
+                logger.warning("Failed to read reference image: %s", e)
+        
+        _acquire_slot(cancel_event)
+        try:
+            # The SDK's in-flight call can't be interrupted, so cancellable calls use REST
+            if self.use_sdk and cancel_event is None:
+                res = self._generate_with_sdk(depth_bytes, user_prompt, reference_bytes, is_color_render, width, height, cancel_event)
+            else:
+                res = self._generate_with_rest(depth_bytes, user_prompt, reference_bytes, is_color_render, width, height, cancel_event)
+        finally:
+            _api_slots.release()
+        _check_cancelled(cancel_event)
         
         if res and len(res) > 0 and res[0]:
-            self._async_log_direct(depth_image_path, user_prompt, reference_image_path, is_color_render, res[0])
+            self._async_log_direct(depth_bytes, user_prompt, reference_bytes, is_color_render, res[0])
         return res
     
-    def _async_log_direct(self, depth_image_path: str, user_prompt: str, reference_image_path: str, is_color_render: bool, output_image_bytes: bytes = None):
+    def _async_log_direct(self, depth_bytes: bytes, user_prompt: str, reference_bytes: Optional[bytes], is_color_render: bool, output_image_bytes: bytes = None):
         from . import beta_api
         if not beta_api._get_eu_format():
             return
             
-        import threading
         import base64
         
         # Build the full system prompt for logging
-        full_prompt = self._build_prompt(user_prompt, has_reference=bool(reference_image_path), is_color_render=is_color_render)
+        full_prompt = self._build_prompt(user_prompt, has_reference=bool(reference_bytes), is_color_render=is_color_render)
         
         def _task():
             try:
                 hwid = beta_api._get_hwid()
-                try:
-                    with open(depth_image_path, 'rb') as f:
-                        in_b64 = base64.b64encode(f.read()).decode('utf-8')
-                except OSError:
-                    in_b64 = None
+                in_b64 = base64.b64encode(depth_bytes).decode('utf-8')
                     
                 ref_b64 = None
-                if reference_image_path:
-                    try:
-                        with open(reference_image_path, 'rb') as f:
-                            ref_b64 = base64.b64encode(f.read()).decode('utf-8')
-                    except OSError:
-                        pass
+                if reference_bytes:
+                    ref_b64 = base64.b64encode(reference_bytes).decode('utf-8')
 
                 out_b64 = None
                 if output_image_bytes:
@@ -352,38 +628,33 @@ class GeminiAPI:
                 pass
 
         # Run quietly in background
-        t = threading.Thread(target=_task, daemon=True)
-        t.start()
+        _background_executor.submit(_task)
     
-    def _generate_with_sdk(self, depth_image_path: str, user_prompt: str, reference_image_path: str = None, is_color_render: bool = False, width: int = 1024, height: int = 1024) -> Tuple[bytes, str]:
+    def _generate_with_sdk(self, depth_bytes: bytes, user_prompt: str, reference_bytes: Optional[bytes] = None, is_color_render: bool = False, width: int = 1024, height: int = 1024, cancel_event: Optional[threading.Event] = None) -> Tuple[bytes, str]:
         """Generate image using official Google GenAI SDK."""
         try:
             if not PIL_AVAILABLE:
                 self.use_sdk = False
                 self._setup_rest_fallback()
-                return self._generate_with_rest(depth_image_path, user_prompt, reference_image_path, is_color_render, width, height)
+                return self._generate_with_rest(depth_bytes, user_prompt, reference_bytes, is_color_render, width, height, cancel_event)
             
-            # Build prompt and load images - include dimensions in prompt
-            full_prompt = self._build_prompt(user_prompt, has_reference=bool(reference_image_path), is_color_render=is_color_render)
+            # Build prompt - include dimensions in prompt
+            full_prompt = self._build_prompt(user_prompt, has_reference=bool(reference_bytes), is_color_render=is_color_render)
             full_prompt += f"\n\nOUTPUT_DIMENSIONS: {width}x{height} pixels (aspect ratio: {width/height:.2f})"
-            depth_image = Image.open(depth_image_path)
             
             # Prepare API contents: prompt -> depth_image -> reference_image
-            contents = [full_prompt, depth_image]
+            # PNG bytes go out as-is; a PIL image would be decoded and re-encoded by the SDK
+            contents = [full_prompt, types.Part.from_bytes(data=depth_bytes, mime_type=MIME_PNG)]
             
-            if reference_image_path:
-                try:
-                    reference_image = Image.open(reference_image_path)
-                    contents.append(reference_image)
-                except Exception as e:
-                    print(f"[GEMINI] Failed to load reference image: {e}")
+            if reference_bytes:
+                contents.append(types.Part.from_bytes(data=reference_bytes, mime_type=_sniff_image_mime(reference_bytes)))
             
             # Map resolution to API format  
             resolution_str = _determine_resolution(width, height)
             
             # Calculate aspect ratio from dimensions
             aspect_ratio_str = _calculate_aspect_ratio(width, height)
-            print(f"[GEMINI] Using resolution: {resolution_str}, aspect ratio: {aspect_ratio_str}")
+            logger.debug("Using resolution: %s, aspect ratio: %s", resolution_str, aspect_ratio_str)
             
             # Build API config
             config = self._build_sdk_config(resolution_str, aspect_ratio_str, temperature=0.8)
@@ -394,69 +665,44 @@ class GeminiAPI:
                 config=config
             )
             
-            print("✅ [GEMINI] Response received, processing parts...")
+            logger.debug("Response received, processing parts...")
             
             return self._extract_sdk_response_image(response)
                 
         except Exception as e:
             if isinstance(e, GeminiAPIError):
                 raise
-            print(f"[GEMINI] SDK error: {str(e)}, falling back to REST")
+            logger.warning("SDK error: %s, falling back to REST", e)
             self.use_sdk = False
             self._setup_rest_fallback()
-            return self._generate_with_rest(depth_image_path, user_prompt, reference_image_path, is_color_render)
+            return self._generate_with_rest(depth_bytes, user_prompt, reference_bytes, is_color_render, width, height, cancel_event)
     
-    def _generate_with_rest(self, depth_image_path: str, user_prompt: str, reference_image_path: str = None, is_color_render: bool = False, width: int = 1024, height: int = 1024) -> Tuple[bytes, str]:
+    def _generate_with_rest(self, depth_bytes: bytes, user_prompt: str, reference_bytes: Optional[bytes] = None, is_color_render: bool = False, width: int = 1024, height: int = 1024, cancel_event: Optional[threading.Event] = None) -> Tuple[bytes, str]:
         """Generate image using REST API fallback."""
         try:
-            # Encode images to base64
-            with open(depth_image_path, 'rb') as f:
-                image_base64 = base64.b64encode(f.read()).decode('utf-8')
-            
-            reference_base64 = None
-            if reference_image_path:
-                try:
-                    with open(reference_image_path, 'rb') as f:
-                        reference_base64 = base64.b64encode(f.read()).decode('utf-8')
-                except Exception as e:
-                    print(f"[GEMINI] Failed to encode reference image: {e}")
-            
             # Build prompt and request
-            full_prompt = self._build_prompt(user_prompt, has_reference=bool(reference_image_path), is_color_render=is_color_render)
+            full_prompt = self._build_prompt(user_prompt, has_reference=bool(reference_bytes), is_color_render=is_color_render)
             full_prompt += f"\n\nCRITICAL OUTPUT SETTING: Generate image EXACTLY at {width}x{height} pixels."
             
-            url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
-            headers = {'Content-Type': 'application/json', 'X-Goog-Api-Client': 'python-blender-addon'}
-            
             # Build parts: prompt -> depth_image -> reference_image
+            blobs = _InlineBlobs()
             parts = [{"text": full_prompt}]
-            parts.append({"inline_data": {"mime_type": MIME_PNG, "data": image_base64}})
+            parts.append(_inline_image(blobs, depth_bytes))
             
-            if reference_base64:
-                parts.append({"inline_data": {"mime_type": MIME_PNG, "data": reference_base64}})
+            if reference_bytes:
+                parts.append(_inline_image(blobs, reference_bytes))
             
             resolution_str = _determine_resolution(width, height)
             
             # Calculate aspect ratio from dimensions
             aspect_ratio_str = _calculate_aspect_ratio(width, height)
             
-            payload = {
-                "contents": [{"parts": parts}],
-                "generationConfig": {
-                    "temperature": 0.8,
-                    "maxOutputTokens": 32768,
-                    "candidateCount": 1,
-                    "responseModalities": ["IMAGE"],
-                    "imageConfig": {
-                        "imageSize": resolution_str,
-                        "aspectRatio": aspect_ratio_str
-                    }
-                }
-            }
+            payload = self._build_rest_payload(parts, 0.8, resolution_str, aspect_ratio_str)
             
-            print(f"📦 [GEMINI] REST payload size: ~{len(str(payload))} chars")
+            body = _dumps_body(payload, blobs)
+            logger.debug("REST payload size: %d bytes", len(body))
             # Make REST request
-            response = requests.post(url, headers=headers, json=payload, timeout=300)
+            response = self._post_rest(body, cancel_event)
             
             if response.status_code == 403:
                 raise GeminiAPIError("API key invalid or quota exceeded.")
@@ -468,32 +714,10 @@ class GeminiAPI:
                 raise GeminiAPIError(f"API request failed with status {response.status_code}")
             
             # Parse response
-            result = response.json()
-            
-            if 'candidates' not in result or not result['candidates']:
-                raise GeminiAPIError("No image generated.")
-            
-            candidate = result['candidates'][0]
-            if 'content' not in candidate:
-                raise GeminiAPIError("Invalid response format.")
-            
-            parts = candidate['content']['parts']
-            
-            # Find and extract image data
-            for part in parts:
-                inline_data = part.get('inline_data') or part.get('inlineData')
-                if inline_data:
-                    data = inline_data.get('data') or inline_data.get('bytes')
-                    if data:
-                        mime_type = inline_data.get('mime_type', inline_data.get('mimeType', 'image/jpeg'))
-                        return base64.b64decode(data), mime_type
-            
-            # Fallback to placeholder
-            text_parts = [part.get('text', '') for part in parts if 'text' in part]
-            if text_parts:
-                return self._create_placeholder_image()
-            
-            raise GeminiAPIError("No image data found in API response")
+            result = _loads_body(response.content)
+            # Drop the raw body before decoding so it is not held alongside the image
+            response = None
+            return self._extract_rest_response_image(result)
             
         except requests.RequestException as e:
             raise GeminiAPIError(f"Network error: {str(e)}")
@@ -524,7 +748,7 @@ class GeminiAPI:
                     "imageConfig": {"imageSize": resolution_str, "aspectRatio": aspect_ratio_str}
                 }
         except Exception as e:
-            print(f"[GEMINI] Config setup failed: {e}")
+            logger.warning("Config setup failed: %s", e)
             return types.GenerateContentConfig(
                 temperature=temperature,
                 candidate_count=1,
@@ -534,13 +758,17 @@ class GeminiAPI:
     def _extract_sdk_response_image(self, response) -> Tuple[bytes, str]:
         """Helper to extract image from SDK response to reduce CC"""
         if not response.candidates or not response.candidates[0].content.parts:
-            print("❌ [GEMINI] No content parts in response")
+            logger.error("No content parts in response")
             raise GeminiAPIError("No image generated. The model may have rejected the request.")
         
         parts = response.candidates[0].content.parts
         for part in parts:
             if part.inline_data is not None:
-                image = Image.open(BytesIO(part.inline_data.data))
+                raw_bytes = part.inline_data.data
+                # Image.open only parses the header, so this check is cheap
+                image = Image.open(BytesIO(raw_bytes))
+                if raw_bytes[:8] == PNG_SIGNATURE and image.mode in ('RGB', 'RGBA'):
+                    return raw_bytes, MIME_PNG
                 if image.mode not in ('RGB', 'RGBA'):
                     image = image.convert('RGB')
                 img_byte_arr = BytesIO()
@@ -553,6 +781,16 @@ class GeminiAPI:
             return self._create_placeholder_image()
         raise GeminiAPIError("No image or text found in API response")
 
+    def _find_inline_data(self, part: dict) -> Optional[dict]:
+        """Return a part's inline image payload, trying the last seen key spelling first."""
+        inline_data = part.get(self._inline_data_key)
+        if inline_data is None:
+            other_key = 'inline_data' if self._inline_data_key == 'inlineData' else 'inlineData'
+            inline_data = part.get(other_key)
+            if inline_data is not None:
+                self._inline_data_key = other_key
+        return inline_data
+
     def _extract_rest_response_image(self, result: dict) -> Tuple[bytes, str]:
         """Helper to extract image from REST response to reduce CC"""
         if 'candidates' not in result or not result['candidates']:
@@ -564,12 +802,12 @@ class GeminiAPI:
         
         parts = candidate['content']['parts']
         for part in parts:
-            inline_data = part.get('inline_data') or part.get('inlineData')
+            inline_data = self._find_inline_data(part)
             if inline_data:
                 data = inline_data.get('data') or inline_data.get('bytes')
                 if data:
                     mime_type = inline_data.get('mime_type', inline_data.get('mimeType', MIME_PNG))
-                    return base64.b64decode(data), mime_type
+                    return _decode_image_b64(data), mime_type
         
         text_parts = [part.get('text', '') for part in parts if 'text' in part]
         if text_parts:
@@ -637,12 +875,12 @@ class GeminiAPI:
         Returns: (image_data, mime_type)
         """
         try:
-            print(f"[GEMINI] Starting image edit with model: {self.model}")
+            logger.debug("Starting image edit with model: %s", self.model)
             
             if is_smart_points:
                 # Smart points prompt is already fully built — use directly
                 full_prompt = edit_prompt
-                print("[GEMINI] Smart Points mode: using pre-built prompt (no wrapper)")
+                logger.debug("Smart Points mode: using pre-built prompt (no wrapper)")
             else:
                 # Build edit prompt with appropriate schema wrapper
                 full_prompt = self._build_edit_prompt(
@@ -651,10 +889,11 @@ class GeminiAPI:
                     has_reference=bool(reference_image_path)
                 )
             
-            if self.use_sdk:
-                return self._edit_with_sdk(image_path, full_prompt, mask_path, reference_image_path, width, height)
-            else:
-                return self._edit_with_rest(image_path, full_prompt, mask_path, reference_image_path, width, height)
+            with _api_slots:
+                if self.use_sdk:
+                    return self._edit_with_sdk(image_path, full_prompt, mask_path, reference_image_path, width, height)
+                else:
+                    return self._edit_with_rest(image_path, full_prompt, mask_path, reference_image_path, width, height)
         
         except Exception as e:
             if isinstance(e, GeminiAPIError):
@@ -903,16 +1142,16 @@ class GeminiAPI:
         """Edit image using SDK"""
         try:
             if not PIL_AVAILABLE:
-                print("[GEMINI] PIL not available, switching to REST")
+                logger.debug("PIL not available, switching to REST")
                 self.use_sdk = False
                 self._setup_rest_fallback()
                 return self._edit_with_rest(image_path, prompt, mask_path, reference_path, width, height)
             
-            print("[GEMINI] Loading images for editing...")
+            logger.debug("Loading images for editing...")
             
             # Load original image
             original_image = Image.open(image_path)
-            print(f"[GEMINI] Original image: {original_image.size}, mode: {original_image.mode}")
+            logger.debug("Original image: %s, mode: %s", original_image.size, original_image.mode)
             
             # Add dimensions to prompt if specified
             orig_w, orig_h = original_image.size
@@ -928,11 +1167,11 @@ class GeminiAPI:
             if reference_path:
                 reference_image = Image.open(reference_path)
                 contents.append(reference_image)
-                print(f"[GEMINI] Reference image FIRST: {reference_image.size}")
+                logger.debug("Reference image FIRST: %s", reference_image.size)
             
             # Add original image SECOND
             contents.append(original_image)
-            print(f"[GEMINI] Original image SECOND: {original_image.size}")
+            logger.debug("Original image SECOND: %s", original_image.size)
             
             # Add mask LAST if provided (for inpainting)
             if mask_path:
@@ -941,10 +1180,10 @@ class GeminiAPI:
                 if mask_image.mode != 'L':
                     mask_image = mask_image.convert('L')
                 contents.append(mask_image)
-                print(f"[GEMINI] Mask image LAST: {mask_image.size}")
+                logger.debug("Mask image LAST: %s", mask_image.size)
             
-            print(f"[GEMINI] Sending edit request to {self.model}...")
-            print(f"[GEMINI] Order: prompt → {'reference → ' if reference_path else ''}original → {'mask' if mask_path else ''}")
+            logger.debug("Sending edit request to %s...", self.model)
+            logger.debug("Order: prompt → %soriginal → %s", "reference → " if reference_path else "", "mask" if mask_path else "")
             
             # Determine resolution
             resolution_str = "1K"
@@ -955,7 +1194,7 @@ class GeminiAPI:
                     resolution_str = "4K"
                 elif width >= 2048 or height >= 2048:
                     resolution_str = "2K"
-                print(f"[GEMINI] Edit Resolution (Forced): {width}x{height} -> {resolution_str}")
+                logger.debug("Edit Resolution (Forced): %dx%d -> %s", width, height, resolution_str)
             else:
                 # Auto-detect from input
                 w, h = original_image.size
@@ -963,7 +1202,7 @@ class GeminiAPI:
                     resolution_str = "4K"
                 elif w >= 2048 or h >= 2048:
                     resolution_str = "2K"
-                print(f"[GEMINI] Edit Resolution (Auto): {w}x{h} -> {resolution_str}")
+                logger.debug("Edit Resolution (Auto): %dx%d -> %s", w, h, resolution_str)
                 
             # Configure generation with resolution and aspect ratio
             # Use forced dimensions if provided, otherwise use original image size
@@ -973,7 +1212,7 @@ class GeminiAPI:
                 orig_w, orig_h = original_image.size
                 aspect_ratio_str = _calculate_aspect_ratio(orig_w, orig_h)
             
-            print(f"[GEMINI] Edit aspect ratio: {aspect_ratio_str}")
+            logger.debug("Edit aspect ratio: %s", aspect_ratio_str)
             
             config = self._build_sdk_config(resolution_str, aspect_ratio_str, temperature=0.7)
             
@@ -984,14 +1223,14 @@ class GeminiAPI:
                 config=config
             )
             
-            print("[GEMINI] Edit response received")
+            logger.debug("Edit response received")
             
             return self._extract_sdk_response_image(response)
             
         except Exception as e:
             if isinstance(e, GeminiAPIError):
                 raise
-            print(f"[GEMINI] SDK edit error: {e}, falling back to REST")
+            logger.warning("SDK edit error: %s, falling back to REST", e)
             self.use_sdk = False
             self._setup_rest_fallback()
             return self._edit_with_rest(image_path, prompt, mask_path, reference_path)
@@ -999,56 +1238,34 @@ class GeminiAPI:
     def _edit_with_rest(self, image_path: str, prompt: str, mask_path: str = None, reference_path: str = None, width: int = 0, height: int = 0) -> Tuple[bytes, str]:
         """Edit image using REST API"""
         try:
-            print("[GEMINI] Editing with REST API...")
+            logger.debug("Editing with REST API...")
             
-            # Encode images
+            # Read images; they are base64-encoded straight into the request body
             with open(image_path, 'rb') as f:
-                image_base64 = base64.b64encode(f.read()).decode('utf-8')
+                image_bytes = f.read()
             
             # Build parts - order matters!
             # CRITICAL: Reference FIRST for style transfer priority
+            blobs = _InlineBlobs()
             parts = [{"text": prompt}]
             
             # Add reference FIRST if provided (style priority)
             if reference_path:
                 with open(reference_path, 'rb') as f:
-                    reference_base64 = base64.b64encode(f.read()).decode('utf-8')
-                parts.append({
-                    "inline_data": {
-                        "mime_type": MIME_PNG,
-                        "data": reference_base64
-                    }
-                })
-                print("[GEMINI] Reference image added FIRST (style priority)")
+                    parts.append(_inline_image(blobs, f.read()))
+                logger.debug("Reference image added FIRST (style priority)")
             
             # Add original image SECOND
-            parts.append({
-                "inline_data": {
-                    "mime_type": MIME_PNG,
-                    "data": image_base64
-                }
-            })
-            print("[GEMINI] Original image added SECOND")
+            parts.append(_inline_image(blobs, image_bytes))
+            logger.debug("Original image added SECOND")
             
             # Add mask if provided (LAST)
             if mask_path:
                 with open(mask_path, 'rb') as f:
-                    mask_base64 = base64.b64encode(f.read()).decode('utf-8')
-                parts.append({
-                    "inline_data": {
-                        "mime_type": MIME_PNG,
-                        "data": mask_base64
-                    }
-                })
-                print("[GEMINI] Mask image added")
+                    parts.append(_inline_image(blobs, f.read()))
+                logger.debug("Mask image added")
             
             # Make REST request
-            url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
-            headers = {
-                'Content-Type': 'application/json',
-                'X-Goog-Api-Client': 'python-blender-addon',
-            }
-            
             # Determine resolution and aspect ratio for REST
             resolution_str = "1K"
             aspect_ratio_str = "1:1"
@@ -1057,7 +1274,7 @@ class GeminiAPI:
                 # User forced resolution
                 resolution_str = _determine_resolution(width, height)
                 aspect_ratio_str = _calculate_aspect_ratio(width, height)
-                print(f"[GEMINI] REST Edit Resolution (Forced): {width}x{height} -> {resolution_str}, Aspect: {aspect_ratio_str}")
+                logger.debug("REST Edit Resolution (Forced): %dx%d -> %s, Aspect: %s", width, height, resolution_str, aspect_ratio_str)
             else:
                 # Auto-detect
                 try:
@@ -1070,32 +1287,23 @@ class GeminiAPI:
                                 resolution_str = "2K"
                             
                             aspect_ratio_str = _calculate_aspect_ratio(w, h)
-                            print(f"[GEMINI] REST Edit Resolution (Auto): {w}x{h} -> {resolution_str}, Aspect: {aspect_ratio_str}")
+                            logger.debug("REST Edit Resolution (Auto): %dx%d -> %s, Aspect: %s", w, h, resolution_str, aspect_ratio_str)
                 except Exception as e:
-                    print(f"[GEMINI] Could not detect image size for REST: {e}")
+                    logger.warning("Could not detect image size for REST: %s", e)
             
-            payload = {
-                "contents": [{"parts": parts}],
-                "generationConfig": {
-                    "temperature": 0.7,  # Lower temperature for more faithful edits
-                    "maxOutputTokens": 32768,
-                    "candidateCount": 1,
-                    "responseModalities": ["IMAGE"],
-                    "imageConfig": {
-                        "imageSize": resolution_str,
-                        "aspectRatio": aspect_ratio_str
-                    }
-                }
-            }
+            # Lower temperature for more faithful edits
+            payload = self._build_rest_payload(parts, 0.7, resolution_str, aspect_ratio_str)
             
-            print("[GEMINI] Sending REST edit request...")
-            response = requests.post(url, headers=headers, json=payload, timeout=300)
+            logger.debug("Sending REST edit request...")
+            response = self._post_rest(_dumps_body(payload, blobs))
             
             if response.status_code != 200:
                 raise GeminiAPIError(f"Edit request failed: {response.status_code} - {response.text}")
             
             # Parse response (same as generate_with_rest)
-            result = response.json()
+            result = _loads_body(response.content)
+            # Drop the raw body before decoding so it is not held alongside the image
+            response = None
             
             if 'candidates' not in result or not result['candidates']:
                 raise GeminiAPIError("No candidates in edit response")
@@ -1104,14 +1312,8 @@ class GeminiAPI:
             
             # Find image part
             for part in parts:
-                inline_data_key = None
-                if 'inline_data' in part:
-                    inline_data_key = 'inline_data'
-                elif 'inlineData' in part:
-                    inline_data_key = 'inlineData'
-                
-                if inline_data_key:
-                    inline_data = part[inline_data_key]
+                inline_data = self._find_inline_data(part)
+                if inline_data:
                     data_key = None
                     if 'data' in inline_data:
                         data_key = 'data'
@@ -1119,9 +1321,9 @@ class GeminiAPI:
                         data_key = 'bytes'
                     
                     if data_key and inline_data[data_key]:
-                        image_data = base64.b64decode(inline_data[data_key])
+                        image_data = _decode_image_b64(inline_data[data_key])
                         mime_type = inline_data.get('mime_type', inline_data.get('mimeType', MIME_PNG))
-                        print(f"[GEMINI] Edited image: {len(image_data)} bytes, format: {mime_type}")
+                        logger.debug("Edited image: %d bytes, format: %s", len(image_data), mime_type)
                         
                         # Verify image is not corrupted
                         if PIL_AVAILABLE:
@@ -1129,20 +1331,20 @@ class GeminiAPI:
                                 from PIL import Image as PILImage
                                 from io import BytesIO
                                 test_img = PILImage.open(BytesIO(image_data))
-                                print(f"[GEMINI] Image verified: {test_img.size}, mode: {test_img.mode}")
+                                logger.debug("Image verified: %s, mode: %s", test_img.size, test_img.mode)
                                 
                                 # Convert to RGB if needed (to fix black/white issue)
                                 if test_img.mode not in ('RGB', 'RGBA'):
-                                    print(f"[GEMINI] Converting from {test_img.mode} to RGB")
+                                    logger.debug("Converting from %s to RGB", test_img.mode)
                                     test_img = test_img.convert('RGB')
                                     
                                     # Re-encode to PNG (standard sRGB)
                                     output = BytesIO()
                                     test_img.save(output, format='PNG')
                                     image_data = output.getvalue()
-                                    print(f"[GEMINI] Converted image: {len(image_data)} bytes")
+                                    logger.debug("Converted image: %d bytes", len(image_data))
                             except Exception as e:
-                                print(f"[GEMINI] Warning: Could not verify image: {e}")
+                                logger.warning("Could not verify image: %s", e)
                         
                         return image_data, mime_type
             
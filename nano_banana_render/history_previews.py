@@ -7,6 +7,10 @@ custom_icons = None
 _load_queue = set()
 _timer_registered = False
 
+def make_prompt_preview(prompt: str) -> str:
+    """Truncated prompt shown in the gallery; stored on the history item once."""
+    return prompt[:60] + "..." if len(prompt) > 60 else prompt
+
 def init_previews():
     global custom_icons
     custom_icons = bpy.utils.previews.new()
@@ -17,6 +21,11 @@ def clear_previews():
         bpy.utils.previews.remove(custom_icons)
         custom_icons = None
 
+def release_preview(filepath):
+    """Free the cached icon for filepath once its history entry is gone."""
+    if custom_icons and filepath and filepath in custom_icons:
+        del custom_icons[filepath]
+
 def _redraw_all_areas():
     """Force redraw of all areas to update UI icons."""
     for window in bpy.context.window_manager.windows:
@@ -30,18 +39,20 @@ def _process_queue():
     if not custom_icons or not _load_queue:
         _timer_registered = False
         return None # Stop timer
-        
-    filepath = _load_queue.pop()
-    if filepath not in custom_icons and os.path.exists(filepath):
-        try:
-            custom_icons.load(filepath, filepath, 'IMAGE')
-            _redraw_all_areas()
-        except Exception as e:
-            print(f"[NANO BANANA] Failed to load preview icon: {e}")
-            
-    # Continue timer if queue not empty
-    if _load_queue:
-        return 0.1
+    
+    # Drain everything in one tick and redraw once, then let the timer die
+    loaded = False
+    while _load_queue:
+        filepath = _load_queue.pop()
+        if filepath not in custom_icons and os.path.exists(filepath):
+            try:
+                custom_icons.load(filepath, filepath, 'IMAGE')
+                loaded = True
+            except Exception as e:
+                print(f"[NANO BANANA] Failed to load preview icon: {e}")
+    
+    if loaded:
+        _redraw_all_areas()
     
     _timer_registered = False
     return None
@@ -10,6 +10,13 @@ import shutil
 from datetime import datetime
 from typing import Optional
 
+# Edit resolution setting → longest output side in pixels ('AUTO' is handled separately)
+RESOLUTION_MAX_DIM = {
+    '1024': 1024, '1K': 1024,
+    '2048': 2048, '2K': 2048,
+    '4096': 4096, '4K': 4096,
+}
+
 class ImageEditThread(threading.Thread):
     """Background thread for AI image editing"""
     
@@ -64,16 +71,11 @@ class ImageEditThread(threading.Thread):
                     print(f"[NANO BANANA] Could not read image size, defaulting to 1024x1024: {e}")
                 
             # Determine target dimensions based on requested resolution
-            max_dim = 1024
-            if self.resolution == '2048' or self.resolution == '2K':
-                max_dim = 2048
-            elif self.resolution == '4096' or self.resolution == '4K':
-                max_dim = 4096
-            elif self.resolution == '1024' or self.resolution == '1K':
-                max_dim = 1024
-            elif self.resolution == 'AUTO':
+            if self.resolution == 'AUTO':
                 # AUTO: use the original image size, but at least 1024
                 max_dim = max(max(orig_w, orig_h), 1024)
+            else:
+                max_dim = RESOLUTION_MAX_DIM.get(self.resolution, 1024)
                 
             # Scale to target while preserving aspect ratio
             if max(orig_w, orig_h) > 0:
@@ -272,8 +274,10 @@ class ImageEditThread(threading.Thread):
                 
                 print(f"[NANO BANANA] Loaded result as: {new_image_name}")
                 
-                # Switch to new image in ALL Image Editor windows
-                if ensure_image_editor_visible(new_image):
+                # Switch to new image in ALL Image Editor windows; a new window is opt-in only
+                render_props = getattr(bpy.context.scene, 'gemini_render', None)
+                open_new_window = render_props is not None and render_props.auto_open_result_window
+                if ensure_image_editor_visible(new_image, open_new_window):
                     print("[NANO BANANA] All Image Editors updated")
                 else:
                     print("[NANO BANANA] Warning: No Image Editor found to display result")
@@ -333,8 +337,9 @@ class ImageEditThread(threading.Thread):
     def _execute_in_main_thread(self, func):
         """Execute function in Blender's main thread"""
         try:
-            # Use Blender's app.timers to execute in main thread
-            bpy.app.timers.register(lambda: (func(), None)[1], first_interval=0.01)
+            # Share the manager's one-shot drain timer instead of a timer per call
+            from .threading_utils import execute_in_main_thread
+            execute_in_main_thread(func)
         except Exception as e:
             print(f"[NANO BANANA] Error executing in main thread: {e}")
 
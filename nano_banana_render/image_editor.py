@@ -10,6 +10,31 @@ from typing import Optional
 from bpy.types import Panel, PropertyGroup, Operator
 from bpy.props import StringProperty, BoolProperty, CollectionProperty, IntProperty, PointerProperty, EnumProperty
 
+from . import history_previews
+from .log import logger
+
+# Resolved once; the editor panel looks up the addon prefs on every redraw
+_ADDON_PACKAGE = __package__ or "nano_banana_render"
+
+# Credits per edit by model tier and resolution
+_EDIT_COST_GRID = {
+    'flash': {'1024': 10, '2048': 15, '4096': 60, 'AUTO': 10},
+    'pro':   {'1024': 30, '2048': 45, '4096': 60, 'AUTO': 30},
+}
+
+_EDIT_AI_MODEL_ITEMS = (
+    ('NANO_BANANA_2', "Nano Banana 2", "gemini-3.1-flash-image-preview — Fast, balanced quality"),
+    ('NANO_BANANA_PRO', "Nano Banana Pro", "gemini-3-pro-image-preview — Highest quality, slower"),
+    ('NANO_BANANA', "Nano Banana", "gemini-2.5-flash-image — Basic, fastest (1K only)"),
+)
+
+_EDIT_RESOLUTION_ITEMS = (
+    ('AUTO', "Auto (Match Input)", "Keep original resolution and aspect ratio"),
+    ('1024', "1K Base", "Scale to 1K base (preserves aspect ratio)"),
+    ('2048', "2K Base", "Scale to 2K base (preserves aspect ratio)"),
+    ('4096', "4K Base", "Scale to 4K base (preserves aspect ratio)"),
+)
+
 # Smart Points — lazy import to keep module order clean
 from . import smart_points as _sp
 
@@ -57,6 +82,29 @@ class EditHistoryItem(PropertyGroup):
         default=""
     )
 
+
+def update_brush_settings(self, context):
+    """Update brush settings when UI changes - apply to Tool Settings
+    Compatible with Blender 4.x and 5.0+
+    """
+    try:
+        ts = context.tool_settings
+        paint = getattr(ts, 'image_paint', None)
+        
+        if paint:
+            _setup_brush_compatibility(context, paint, self.brush_size, self.brush_color)
+        
+        # Force UI redraw
+        if hasattr(context, 'screen') and context.screen:
+            for area in context.screen.areas:
+                if area.type == 'IMAGE_EDITOR':
+                    area.tag_redraw()
+        
+    except Exception as e:
+        logger.error("Brush update error: %s", e)
+        logger.debug("Brush update traceback:", exc_info=True)
+
+
 class ImageEditorProperties(PropertyGroup):
     """Properties for Image Editor panel - stored in WindowManager for session persistence"""
     
@@ -72,11 +120,7 @@ class ImageEditorProperties(PropertyGroup):
     ai_model: EnumProperty(
         name="Model",
         description="Select which AI model to use for editing",
-        items=[
-            ('NANO_BANANA_2', "Nano Banana 2", "gemini-3.1-flash-image-preview — Fast, balanced quality"),
-            ('NANO_BANANA_PRO', "Nano Banana Pro", "gemini-3-pro-image-preview — Highest quality, slower"),
-            ('NANO_BANANA', "Nano Banana", "gemini-2.5-flash-image — Basic, fastest (1K only)"),
-        ],
+        items=_EDIT_AI_MODEL_ITEMS,
         default='NANO_BANANA_PRO',
     )
     
@@ -139,7 +183,7 @@ class ImageEditorProperties(PropertyGroup):
         default=50,
         min=1,
         max=500,
-        update=lambda self, context: update_brush_settings(self, context)
+        update=update_brush_settings
     )
     
     brush_color: bpy.props.FloatVectorProperty(
@@ -149,7 +193,7 @@ class ImageEditorProperties(PropertyGroup):
         default=(1.0, 1.0, 1.0),
         min=0.0,
         max=1.0,
-        update=lambda self, context: update_brush_settings(self, context)
+        update=update_brush_settings
     )
     
     # UI state
@@ -170,12 +214,7 @@ class ImageEditorProperties(PropertyGroup):
     resolution: bpy.props.EnumProperty(
         name="Resolution",
         description="Choose output resolution (aspect ratio preserved from input)",
-        items=[
-            ('AUTO', "Auto (Match Input)", "Keep original resolution and aspect ratio"),
-            ('1024', "1K Base", "Scale to 1K base (preserves aspect ratio)"),
-            ('2048', "2K Base", "Scale to 2K base (preserves aspect ratio)"),
-            ('4096', "4K Base", "Scale to 4K base (preserves aspect ratio)"),
-        ],
+        items=_EDIT_RESOLUTION_ITEMS,
         default='AUTO',
     )
     
@@ -216,15 +255,16 @@ class BananaPTImageEditorPanel(Panel):
         # Image info
         box = layout.box()
         box.label(text=f"🖼️ {image.name}", icon='IMAGE_DATA')
-        box.label(text=f"📏 {image.size[0]}x{image.size[1]}", icon='EMPTY_DATA')
+        width, height = image.size
+        box.label(text=f"📏 {width}x{height}", icon='EMPTY_DATA')
         
         # Model selection
         box.prop(props, "ai_model", text="Model")
         
         # ─── Beta Token Status (Shared with 3D Viewport) ───
         scene_props = context.scene.gemini_render
-        prefs = context.preferences.addons.get("nano_banana_render")
-        has_token = prefs and hasattr(prefs.preferences, 'beta_token') and prefs.preferences.beta_token.strip()
+        prefs = context.preferences.addons.get(_ADDON_PACKAGE)
+        has_token = prefs and getattr(prefs.preferences, 'beta_token', "").strip()
         
         if not has_token:
             row = layout.row()
@@ -233,12 +273,8 @@ class BananaPTImageEditorPanel(Panel):
         else:
             # ─── Cost per render ───
             model_tier = 'pro' if props.ai_model == 'NANO_BANANA_PRO' else 'flash'
-            cost_grid = {
-                'flash': {'1024': 10, '2048': 15, '4096': 60, 'AUTO': 10},
-                'pro':   {'1024': 30, '2048': 45, '4096': 60, 'AUTO': 30},
-            }
             res = getattr(props, 'resolution', '1024')
-            cost = cost_grid.get(model_tier, cost_grid['pro']).get(res, 30)
+            cost = _EDIT_COST_GRID.get(model_tier, _EDIT_COST_GRID['pro']).get(res, 30)
             row = box.row()
             row.scale_y = 0.8
             row.label(text=f"Cost: {cost} credits per render")
@@ -425,18 +461,20 @@ class BananaPTImageEditorPanel(Panel):
         box.label(text=props.status_text, icon='INFO')
         
         # History
-        if len(props.edit_history) > 0:
+        history = props.edit_history
+        n = len(history)
+        if n > 0:
             layout.separator()
             row = layout.row()
+            show_history = props.show_history
             row.prop(props, "show_history", 
-                    text=f"History ({len(props.edit_history)} edits)" if not props.show_history else "Hide History",
+                    text=f"History ({n} edits)" if not show_history else "Hide History",
                     toggle=True, icon='TIME')
             
-            if props.show_history:
-                from . import history_previews
-                for i, item in enumerate(reversed(props.edit_history)):
-                    actual_index = len(props.edit_history) - 1 - i
-                    edit_number = len(props.edit_history) - i
+            if show_history:
+                for actual_index in range(n - 1, -1, -1):
+                    item = history[actual_index]
+                    edit_number = actual_index + 1
                     
                     box = layout.box()
                     
@@ -503,6 +541,28 @@ OP_APPLY_EDIT = "nano_banana.apply_edit"
 MSG_NO_IMAGE = "No image in editor"
 
 
+def _read_pixels(image):
+    """Read image pixels as a (h, w, channels) float32 array in one bulk copy."""
+    import numpy as np
+    w, h = image.size
+    buf = np.empty(w * h * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(buf)
+    return buf.reshape((h, w, image.channels))
+
+
+def _to_uint8(pixels):
+    """Convert 0..1 float pixels to rounded uint8, scaling in place.
+    The float buffer is reused, so only the uint8 output is allocated.
+    """
+    import numpy as np
+    np.multiply(pixels, 255.0, out=pixels)
+    np.add(pixels, 0.5, out=pixels)
+    np.clip(pixels, 0.0, 255.0, out=pixels)
+    u8 = np.empty(pixels.shape, dtype=np.uint8)
+    u8[...] = pixels
+    return u8
+
+
 class NanoBananaOTApplyEdit(Operator):
     """Apply AI edit to the current image"""
     bl_idname = OP_APPLY_EDIT
@@ -566,10 +626,8 @@ class NanoBananaOTApplyEdit(Operator):
                 from PIL import Image as PILImage
                 import numpy as np
                 
-                w, h = image.size
-                
                 # Read raw pixel data from Blender (always linear floats, RGBA)
-                pixels = np.array(image.pixels[:]).reshape((h, w, image.channels))
+                pixels = _read_pixels(image)
                 
                 # Flip vertically (Blender stores bottom-up, PIL expects top-down)
                 pixels = np.flip(pixels, axis=0)
@@ -592,10 +650,10 @@ class NanoBananaOTApplyEdit(Operator):
                     # Image is already sRGB-tagged → pixels are already in sRGB space
                     # Just clamp to valid output range
                     print("[NANO BANANA] Image is sRGB, direct export...")
-                    pixels = np.clip(pixels, 0.0, 1.0)
+                    np.clip(pixels, 0.0, 1.0, out=pixels)
                 
                 # Convert float [0,1] → uint8 [0,255]
-                pixels_u8 = (pixels * 255.0 + 0.5).astype(np.uint8)
+                pixels_u8 = _to_uint8(pixels)
                 
                 # Create PIL image
                 if image.channels == 4:
@@ -642,8 +700,7 @@ class NanoBananaOTApplyEdit(Operator):
                     from PIL import Image as PILImage
                     import numpy as np
                     
-                    rw, rh = ref_image.size
-                    ref_pixels = np.array(ref_image.pixels[:]).reshape((rh, rw, ref_image.channels))
+                    ref_pixels = _read_pixels(ref_image)
                     ref_pixels = np.flip(ref_pixels, axis=0)
                     
                     cs_name = ref_image.colorspace_settings.name.lower()
@@ -657,9 +714,9 @@ class NanoBananaOTApplyEdit(Operator):
                                         1.055 * np.power(rgb, 1.0 / 2.4) - 0.055)
                         ref_pixels[:, :, :3] = srgb
                     else:
-                        ref_pixels = np.clip(ref_pixels, 0.0, 1.0)
+                        np.clip(ref_pixels, 0.0, 1.0, out=ref_pixels)
                     
-                    ref_u8 = (ref_pixels * 255.0 + 0.5).astype(np.uint8)
+                    ref_u8 = _to_uint8(ref_pixels)
                     if ref_image.channels == 4:
                         pil_ref = PILImage.fromarray(ref_u8, 'RGBA')
                     else:
@@ -784,10 +841,8 @@ class NanoBananaOTApplyEdit(Operator):
                 
                 print("[NANO BANANA] Using PIL for inpaint extraction")
                 
-                pixels = list(image.pixels[:])
-                
                 if image.channels >= 3:
-                    pixel_array = np.array(pixels).reshape((height, width, image.channels))
+                    pixel_array = _read_pixels(image)
                     rgb = pixel_array[:, :, :3]
                     
                     # Detect painted areas (any non-black color)
@@ -802,8 +857,9 @@ class NanoBananaOTApplyEdit(Operator):
                     
                     # Save colored guide
                     guide_path = os.path.join(temp_dir, "inpaint_guide.png")
-                    rgb_uint8 = (rgb * 255).astype(np.uint8)
-                    rgb_uint8 = np.flipud(rgb_uint8)
+                    np.multiply(rgb, 255.0, out=rgb)
+                    rgb_uint8 = np.empty(rgb.shape, dtype=np.uint8)
+                    rgb_uint8[...] = rgb[::-1]
                     
                     pil_guide = PILImage.fromarray(rgb_uint8, mode='RGB')
                     pil_guide.save(guide_path)
@@ -997,14 +1053,12 @@ class NanoBananaOTLoadHistoryEdit(Operator):
                     
                     # Ensure draw handler is active if we restored points
                     if len(props.smart_points) > 0:
-                        from . import smart_points as _sp
                         _sp.ensure_draw_handler()
             except Exception as e:
                 print(f"[NANO BANANA] Failed to load smart points from history: {e}")
         else:
             # If no smart points in this history, disable the mode
             props.use_smart_points = False
-            from . import smart_points as _sp
             _sp.remove_draw_handler()
         
         return {'FINISHED'}
@@ -1250,12 +1304,12 @@ class NanoBananaOTApplyInpaint(Operator):
 
 def _get_image_editor_area_space(context):
     """Find and return the active Image Editor area and space."""
-    for area in context.screen.areas:
-        if area.type == 'IMAGE_EDITOR':
-            for space in area.spaces:
-                if space.type == 'IMAGE_EDITOR' and space.image:
-                    return area, space
-    return None, None
+    # An area's active space always matches its type, so no inner scan of area.spaces
+    return next(
+        ((area, area.spaces.active) for area in context.screen.areas
+         if area.type == 'IMAGE_EDITOR' and area.spaces.active.image),
+        (None, None),
+    )
 
 def _setup_brush_compatibility(context, paint, brush_size, brush_color):
     """Setup brush properties with compatibility for Blender 4.x and 5.0."""
@@ -1266,10 +1320,14 @@ def _setup_brush_compatibility(context, paint, brush_size, brush_color):
         if ups is None:
             ups = getattr(ts, 'unified_paint_settings', None)
         
+        # This runs on every brush drag step; every RNA write notifies
+        # listeners, so only assign values that actually change.
         if ups:
             try:
-                ups.use_unified_size = False
-                ups.use_unified_color = False
+                if ups.use_unified_size:
+                    ups.use_unified_size = False
+                if ups.use_unified_color:
+                    ups.use_unified_color = False
             except Exception:
                 pass
         
@@ -1289,13 +1347,18 @@ def _setup_brush_compatibility(context, paint, brush_size, brush_color):
                     brush = paint.brush
         
         if brush:
-            brush.size = brush_size
-            brush.color = (brush_color[0], brush_color[1], brush_color[2])
-            brush.strength = 1.0
-            brush.blend = 'MIX'
+            color = (brush_color[0], brush_color[1], brush_color[2])
+            if brush.size != brush_size:
+                brush.size = brush_size
+            if tuple(brush.color) != color:
+                brush.color = color
+            if brush.strength != 1.0:
+                brush.strength = 1.0
+            if brush.blend != 'MIX':
+                brush.blend = 'MIX'
             return True
     except Exception as e:
-        print(f"[NANO BANANA] Brush setup error: {e}")
+        logger.warning("Brush setup error: %s", e)
     return False
 
 def on_mask_toggle(self, context):
@@ -1311,7 +1374,7 @@ def on_mask_toggle(self, context):
             # Switch to Paint mode
             with context.temp_override(area=area, space_data=space):
                 space.mode = 'PAINT'
-                print("[NANO BANANA] Switched to Paint mode")
+                logger.debug("Switched to Paint mode")
                 
                 ts = context.tool_settings
                 if hasattr(ts, 'image_paint'):
@@ -1320,14 +1383,13 @@ def on_mask_toggle(self, context):
             # Switch to View mode
             with context.temp_override(area=area, space_data=space):
                 space.mode = 'VIEW'
-                print("[NANO BANANA] Switched to View mode")
+                logger.debug("Switched to View mode")
         
         area.tag_redraw()
                         
     except Exception as e:
-        import traceback
-        print(f"[NANO BANANA] Mask toggle error: {e}")
-        traceback.print_exc()
+        logger.error("Mask toggle error: %s", e)
+        logger.debug("Mask toggle traceback:", exc_info=True)
 
 
 class NanoBananaOTLoadReferenceImage(Operator):
@@ -1387,29 +1449,6 @@ class NanoBananaOTUnlinkReferenceImage(Operator):
         return {'FINISHED'}
 
 
-def update_brush_settings(self, context):
-    """Update brush settings when UI changes - apply to Tool Settings
-    Compatible with Blender 4.x and 5.0+
-    """
-    try:
-        ts = context.tool_settings
-        paint = getattr(ts, 'image_paint', None)
-        
-        if paint:
-            _setup_brush_compatibility(context, paint, self.brush_size, self.brush_color)
-        
-        # Force UI redraw
-        if hasattr(context, 'screen') and context.screen:
-            for area in context.screen.areas:
-                if area.type == 'IMAGE_EDITOR':
-                    area.tag_redraw()
-        
-    except Exception as e:
-        import traceback
-        print(f"[NANO BANANA] Brush update error: {e}")
-        traceback.print_exc()
-
-
 # Registration classes
 classes = (
     *_sp.classes,            # SmartPointItem MUST be registered before ImageEditorProperties
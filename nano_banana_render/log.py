@@ -9,13 +9,22 @@ Usage:
 """
 
 import logging
+import os
 
 logger = logging.getLogger("nano_banana")
 
+# GEMINI_DEBUG=1 turns on the verbose per-render diagnostics regardless of prefs
+_ENV_DEBUG = os.environ.get("GEMINI_DEBUG") == "1"
+
 if not logger.handlers:
     handler = logging.StreamHandler()
     handler.setFormatter(
         logging.Formatter("[NANODE] %(levelname)s: %(message)s")
     )
     logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(logging.DEBUG if _ENV_DEBUG else logging.INFO)
+
+
+def set_verbose(enabled: bool) -> None:
+    """Switch DEBUG output on or off (the GEMINI_DEBUG env var keeps it on)."""
+    logger.setLevel(logging.DEBUG if enabled or _ENV_DEBUG else logging.INFO)
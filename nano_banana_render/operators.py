@@ -8,6 +8,7 @@ import tempfile
 import logging
 from . import gemini_api
 from . import depth_utils
+from . import history_previews
 from . import threading_utils
 from .credentials import (
     save_credentials_file,
@@ -407,6 +408,8 @@ class GeminiOTDeleteHistory(Operator):
             if history_item.style_reference_thumbnail and history_item.style_reference_thumbnail in bpy.data.images:
                 bpy.data.images.remove(bpy.data.images[history_item.style_reference_thumbnail])
             
+            history_previews.release_preview(history_item.filepath)
+            
             # Remove from history
             props.render_history.remove(self.history_index)
             
@@ -419,6 +422,28 @@ class GeminiOTDeleteHistory(Operator):
             return {'CANCELLED'}
 
 
+class GeminiOTHistoryPage(Operator):
+    """Flip the render gallery page"""
+    bl_idname = "gemini.history_page"
+    bl_label = "Change Gallery Page"
+    bl_description = "Show newer or older renders in the gallery"
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    step: IntProperty(
+        name="Step",
+        description="Pages to move (negative = newer)",
+        default=1
+    )
+
+    def execute(self, context):
+        from .ui_panel import HISTORY_PAGE_SIZE
+        props = context.scene.gemini_render
+        n = len(props.render_history)
+        last_page = max((n - 1) // HISTORY_PAGE_SIZE, 0)
+        props.history_page = min(max(props.history_page + self.step, 0), last_page)
+        return {'FINISHED'}
+
+
 class GeminiOTUseHistoryPrompt(Operator):
     """Use prompt from render history"""
     bl_idname = "gemini.use_history_prompt"
@@ -15,6 +15,12 @@ import bpy
 import threading
 import os
 import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from . import history_previews
+from . import threading_utils
+from . import result_cache
+from .log import logger
 
 
 # Model name mapping
@@ -28,9 +34,20 @@ MODEL_MAP = {
 _pre_capture = {
     'path': None,
     'ready': False,
+    'reference': None,
+    'job': None,
 }
 
 
+def _capture_reference(scene):
+    """Read the style reference on the main thread; render() only writes the bytes."""
+    try:
+        return threading_utils.capture_reference_image(scene)
+    except Exception as e:
+        logger.warning("Error reading reference image: %s", e)
+        return None
+
+
 class BananaOTRender(bpy.types.Operator):
     """Pre-capture viewport, then trigger F12 render engine"""
     bl_idname = "banana.ai_render"
@@ -74,17 +91,29 @@ class BananaOTRender(bpy.types.Operator):
 
         try:
             if props.render_mode == 'DEPTH':
-                print("[NANO BANANA] Pre-capturing depth map...")
-                path = depth_renderer.render_depth_map_mist(
+                cache_key = depth_utils.DepthCache.make_key(
                     scene, props.mist_start, props.mist_depth, props.mist_falloff
                 )
+                path = depth_utils.depth_cache.get(cache_key)
+                if path:
+                    logger.info("Reusing cached depth map")
+                else:
+                    logger.debug("Pre-capturing depth map...")
+                    path = depth_renderer.render_depth_map_mist(
+                        scene, props.mist_start, props.mist_depth, props.mist_falloff
+                    )
+                    depth_utils.depth_cache.put(cache_key, path)
+                # Geometry edits before render() runs must not delete this capture
+                depth_utils.depth_cache.pin(path)
             else:
-                print("[NANO BANANA] Pre-capturing EEVEE viewport...")
+                logger.debug("Pre-capturing EEVEE viewport...")
                 path = depth_renderer.render_regular_eevee(scene)
 
             _pre_capture['path'] = path
+            _pre_capture['reference'] = _capture_reference(scene)
+            _pre_capture['job'] = threading_utils.RenderJob.from_scene(scene)
             _pre_capture['ready'] = True
-            print(f"[NANO BANANA] Pre-capture done: {path}")
+            logger.info("Pre-capture done: %s", path)
 
         except Exception as e:
             self.report({'ERROR'}, f"Viewport capture failed: {e}")
@@ -138,22 +167,25 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
                 try:
                     bpy.ops.banana.ai_render()
                 except Exception as e:
-                    print(f"[NANO BANANA] Auto-trigger failed: {e}")
+                    logger.error("Auto-trigger failed: %s", e)
                 return None  # Don't repeat
 
             bpy.app.timers.register(_trigger_proper_render, first_interval=0.5)
             return
 
         depth_path = _pre_capture['path']
+        reference_source = _pre_capture.get('reference')
+        # Settings snapshot taken by the operator on the main thread
+        job = _pre_capture.get('job') or threading_utils.RenderJob.from_scene(scene)
         _pre_capture['ready'] = False  # Consume
+        _pre_capture['reference'] = None
+        _pre_capture['job'] = None
 
         # Validate beta token
         from . import beta_api
 
-        from . import threading_utils
-
-        render_mode = props.render_mode
-        model_name = MODEL_MAP.get(props.ai_model, 'gemini-3.1-flash-image-preview')
+        render_mode = job.render_mode
+        model_name = MODEL_MAP.get(job.ai_model, 'gemini-3.1-flash-image-preview')
 
         # --- Call via Beta Server ---
         gen_type = 'render_eevee' if render_mode == 'EEVEE' else 'render_depth'
@@ -162,12 +194,14 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
         else:
             self.update_stats("", f"Sending image to {model_name}...")
 
-        reference_path = threading_utils.save_reference_image_temp(scene)
+        # Write the reference temp file while the depth map is prepared
+        reference_future = threading_utils._io_executor.submit(
+            threading_utils.write_reference_image, reference_source
+        )
 
         # Determine dimensions from scene render settings and addon UI property
-        render = scene.render
-        base_res = int(props.resolution) if hasattr(props, 'resolution') else 1024
-        scene_aspect = render.resolution_x / render.resolution_y if render.resolution_y > 0 else 1.0
+        base_res = job.resolution
+        scene_aspect = job.scene_width / job.scene_height if job.scene_height > 0 else 1.0
         
         if scene_aspect >= 1:
             width = base_res
@@ -176,14 +210,45 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
             width = int(base_res * scene_aspect)
             height = base_res
 
+        # Shrink the 16-bit full-size mist capture before it is base64'd and uploaded
+        if render_mode == 'DEPTH':
+            try:
+                from . import depth_utils
+                depth_path = depth_utils.prepare_depth_for_upload(depth_path, max(width, height))
+            except Exception as e:
+                logger.warning("Could not downscale depth map, sending original: %s", e)
+
+        try:
+            reference_path = reference_future.result()
+        except Exception as e:
+            logger.warning("Error saving reference image: %s", e)
+            reference_path = None
+
         # Determine token for direct vs server API
         token = ""
         prefs = bpy.context.preferences.addons.get("nano_banana_render")
         if prefs and hasattr(prefs.preferences, "beta_token"):
             token = prefs.preferences.beta_token.strip()
 
+        # Identical request seen before: skip the network call (opt-in)
+        image_data = None
+        cache_key = None
+        if job.use_result_cache:
+            try:
+                cache_key = result_cache.make_key(
+                    depth_path, reference_path, job.prompt, model_name, render_mode, width, height
+                )
+                image_data = result_cache.load(cache_key)
+            except OSError as e:
+                logger.warning("Result cache unavailable: %s", e)
+            if image_data:
+                logger.info("Using cached AI result")
+                self.update_stats("", "Using cached AI result...")
+
         try:
-            if token.startswith("AIza"):
+            if image_data:
+                cache_key = None  # Already cached
+            elif token.startswith("AIza"):
                 # ─── Direct Google API Mode ───
                 from .gemini_api import GeminiAPI, GeminiAPIError
                 
@@ -198,9 +263,10 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
                 self.update_stats("", "Connecting directly to Google API...")
                 gemini = GeminiAPI(api_key=token, model=model_name)
                 is_color = (render_mode == 'EEVEE')
-                image_data, _ = gemini.generate_image(
+                image_data, _ = self._run_cancellable(
+                    gemini.generate_image,
                     depth_image_path=depth_path,
-                    user_prompt=props.prompt,
+                    user_prompt=job.prompt,
                     reference_image_path=reference_path,
                     is_color_render=is_color,
                     width=width,
@@ -214,7 +280,7 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
                 is_color = (render_mode == 'EEVEE')
                 prompt_builder = GeminiAPI.__new__(GeminiAPI)
                 full_prompt = prompt_builder._build_prompt(
-                    props.prompt,
+                    job.prompt,
                     has_reference=bool(reference_path),
                     is_color_render=is_color
                 )
@@ -227,7 +293,7 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
                     gen_type=gen_type,
                     width=width,
                     height=height,
-                    user_prompt=props.prompt,
+                    user_prompt=job.prompt,
                 )
     
                 # Update balance and generation tracking for rating UI
@@ -258,7 +324,7 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
                             credits_available=credits_available
                         )
                     except Exception as ex:
-                        print(f"[NANO BANANA] Popup error: {ex}")
+                        logger.error("Popup error: %s", ex)
                 
                 threading_utils.execute_in_main_thread(_show_popup)
                 self.report({'ERROR'}, f"Not enough credits: need {credits_needed}, have {credits_available}")
@@ -267,22 +333,20 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
             return
             
         except Exception as e:
-            if type(e).__name__ == "GeminiAPIError":
+            if type(e).__name__ == "GeminiCancelledError":
+                logger.info("AI render cancelled")
+            elif type(e).__name__ == "GeminiAPIError":
                 self.report({'ERROR'}, f"Google API Error: {str(e)}")
             else:
                 self.report({'ERROR'}, f"AI generation failed: {str(e)}")
             return
         finally:
+            # Cleanup is fire-and-forget; the result is processed meanwhile
             if reference_path:
-                try:
-                    os.unlink(reference_path)
-                except OSError:
-                    pass
+                threading_utils._io_executor.submit(threading_utils._remove_file, reference_path)
             from . import depth_utils
-            try:
-                depth_utils.DepthRenderer().cleanup_temp_files()
-            except Exception:
-                pass
+            depth_utils.depth_cache.unpin()
+            threading_utils._io_executor.submit(threading_utils._cleanup_depth_files, depth_utils.DepthRenderer())
 
         if self.test_break():
             return
@@ -292,101 +356,107 @@ class NanoBananaRenderEngine(bpy.types.RenderEngine):
             self.report({'ERROR'}, f"AI returned empty or invalid image ({len(image_data) if image_data else 0} bytes)")
             return
 
+        if cache_key:
+            result_cache.store_async(cache_key, image_data)
+
         # --- Display AI result directly in F12 render buffer ---
         self.update_stats("", "Loading AI result...")
 
-        render_w = int(scene.render.resolution_x * scene.render.resolution_percentage / 100)
-        render_h = int(scene.render.resolution_y * scene.render.resolution_percentage / 100)
+        render_w, render_h = job.output_size
+
+        # Decode once, straight to the F12 buffer size
+        try:
+            decoded = threading_utils.decode_result_pixels(image_data, size=(render_w, render_h))
+        except Exception as e:
+            logger.warning("Could not decode AI result in render thread: %s", e)
+            decoded = None
 
-        self._write_image_to_render_buffer(image_data, render_w, render_h)
+        self._write_image_to_render_buffer(decoded, render_w, render_h)
+
+        # Names, timestamps and the history file write stay off the main thread
+        try:
+            history_entry = _prepare_history_entry(image_data, job.prompt)
+        except OSError as e:
+            logger.warning("Could not save history copy: %s", e)
+            history_entry = None
 
         elapsed = time.time() - render_start
         
         def _process_result_main_thread():
-            _finalize_render_in_main_thread(image_data, props.prompt, scene, elapsed)
+            _finalize_render_in_main_thread(image_data, history_entry, scene, elapsed)
 
         threading_utils.execute_in_main_thread(_process_result_main_thread)
 
         self.update_stats("", f"AI render completed in {elapsed:.1f}s")
 
 
-    def _write_image_to_render_buffer(self, image_data: bytes, render_w: int, render_h: int):
-        """Helper to write image directly to Blender F12 buffer."""
+    def _run_cancellable(self, request, **kwargs):
+        """Run a blocking API request on a worker thread and pass it a cancel_event
+        that is set once test_break() reports Esc (polled from the render thread)."""
+        cancel_event = threading.Event()
+        future = threading_utils.submit_render_job(request, cancel_event=cancel_event, **kwargs)
+        while True:
+            try:
+                return future.result(timeout=0.25)
+            except FutureTimeoutError:
+                if self.test_break():
+                    # Don't hold the render job for an in-flight HTTP call; its result is dropped
+                    logger.debug("Render cancelled, aborting API request")
+                    cancel_event.set()
+                    from .gemini_api import GeminiCancelledError
+                    raise GeminiCancelledError("Render cancelled")
+
+    def _write_image_to_render_buffer(self, decoded, render_w: int, render_h: int):
+        """Helper to write decoded pixels directly to Blender F12 buffer."""
         buffer_written = False
         try:
-            import io
-            try:
-                from PIL import Image as PILImage
-                pil_img = PILImage.open(io.BytesIO(image_data)).convert('RGBA')
-                pil_img = pil_img.resize((render_w, render_h), PILImage.LANCZOS)
-                
-                raw = pil_img.tobytes()
-                pixel_count = render_w * render_h
-                pixels = []
-                for i in range(pixel_count):
-                    offset = i * 4
-                    pixels.extend([raw[offset]/255.0, raw[offset+1]/255.0, raw[offset+2]/255.0, raw[offset+3]/255.0])
-                
-                flipped_pixels = []
-                for row in range(render_h - 1, -1, -1):
-                    row_start = row * render_w * 4
-                    flipped_pixels.extend(pixels[row_start:row_start + render_w * 4])
-                
+            if decoded is None:
+                logger.debug("PIL not available, using bpy.data.images fallback")
+            else:
+                pixels, _, _ = decoded
                 result = self.begin_result(0, 0, render_w, render_h)
                 layer = result.layers[0]
                 try:
-                    layer.passes["Combined"].rect = [flipped_pixels[i:i+4] for i in range(0, len(flipped_pixels), 4)]
+                    layer.passes["Combined"].rect.foreach_set(pixels)
                 except Exception:
-                    layer.passes["Combined"].rect.foreach_set(flipped_pixels)
+                    layer.passes["Combined"].rect = pixels.reshape(-1, 4).tolist()
                 self.end_result(result)
                 buffer_written = True
-            except ImportError:
-                print("[NANO BANANA] PIL not available, using bpy.data.images fallback")
         except Exception as e:
-            print(f"[NANO BANANA] Direct buffer write failed: {e}")
+            logger.error("Direct buffer write failed: %s", e)
 
         if not buffer_written:
             try:
                 result = self.begin_result(0, 0, render_w, render_h)
                 self.end_result(result)
             except Exception as e:
-                print(f"[NANO BANANA] Error writing fallback to render buffer: {e}")
+                logger.warning("Error writing fallback to render buffer: %s", e)
 
 
-def _finalize_render_in_main_thread(image_data: bytes, prompt: str, scene, elapsed: float):
+def _finalize_render_in_main_thread(image_data: bytes, history_entry, scene, elapsed: float):
     """Helper executed in main thread to load image datablock and swap viewer."""
-    import tempfile
-    import os
-    temp_path = None
-    
+    _pre_capture['result_image'] = None
+    history_img = None
     try:
-        _save_render_to_history(image_data, prompt, scene)
+        history_img = _save_render_to_history(image_data, history_entry, scene)
     except Exception as e:
-        print(f"[NANO BANANA] History save error: {e}")
+        logger.error("History save error: %s", e)
         
     try:
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
-            f.write(image_data)
-            temp_path = f.name
-
-        result_img_name = "Nano Banana Render"
-        if result_img_name in bpy.data.images:
-            bpy.data.images.remove(bpy.data.images[result_img_name])
-
-        result_img = bpy.data.images.load(temp_path)
-        result_img.name = result_img_name
+        if history_img is not None:
+            # The packed history image doubles as the display target (no second copy)
+            stale = bpy.data.images.get("Nano Banana Render")
+            if stale:
+                bpy.data.images.remove(stale)
+            result_img = history_img
+        else:
+            # Only when no history entry was saved; the rare path reads from a temp file
+            result_img = threading_utils.image_from_result("Nano Banana Render", image_data)
         result_img.colorspace_settings.name = 'sRGB'
-        result_img.pack()
 
-        _pre_capture['result_image'] = result_img_name
+        _pre_capture['result_image'] = result_img.name
     except Exception as e:
-        print(f"[NANO BANANA] Error loading AI result into Blender: {e}")
-    finally:
-        if temp_path:
-            try:
-                os.unlink(temp_path)
-            except OSError:
-                pass
+        logger.error("Error loading AI result into Blender: %s", e)
 
     if hasattr(scene, 'gemini_render'):
         scene.gemini_render.status_text = f"Done in {elapsed:.1f}s"
@@ -397,24 +467,28 @@ def _finalize_render_in_main_thread(image_data: bytes, prompt: str, scene, elaps
         ai_img = bpy.data.images[result_img_name]
         for window in bpy.context.window_manager.windows:
             for area in window.screen.areas:
-                if area.type == 'IMAGE_EDITOR':
-                    for space in area.spaces:
-                        if space.type == 'IMAGE_EDITOR' and getattr(space.image, 'name', '') == 'Render Result':
-                            space.image = ai_img
-                area.tag_redraw()
-
-
-def _save_render_to_history(image_data: bytes, user_prompt: str, scene):
-    """Save render result to history with packed image data."""
+                if area.type != 'IMAGE_EDITOR':
+                    continue
+                swapped = False
+                for space in area.spaces:
+                    if space.type == 'IMAGE_EDITOR' and getattr(space.image, 'name', '') == 'Render Result':
+                        space.image = ai_img
+                        swapped = True
+                # Only editors that now show the result need a redraw
+                if swapped:
+                    area.tag_redraw()
+
+
+def _prepare_history_entry(image_data: bytes, user_prompt: str):
+    """Name, timestamps and on-disk copy for a history entry (no bpy, render thread)."""
     import tempfile
     import datetime
-    import shutil
 
     if not user_prompt:
-        return
+        return None
 
-    timestamp_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    permanent_name = f"AI_Result_{timestamp_str}"
+    now = datetime.datetime.now()
+    permanent_name = f"AI_Result_{now.strftime('%Y%m%d_%H%M%S')}"
 
     # Save to permanent location
     permanent_dir = os.path.join(tempfile.gettempdir(), "nano_banana_history")
@@ -424,22 +498,40 @@ def _save_render_to_history(image_data: bytes, user_prompt: str, scene):
     with open(permanent_path, 'wb') as f:
         f.write(image_data)
 
+    return {
+        'name': permanent_name,
+        'path': permanent_path,
+        'prompt': user_prompt,
+        'prompt_preview': history_previews.make_prompt_preview(user_prompt),
+        'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def _save_render_to_history(image_data: bytes, entry, scene):
+    """Save render result to history with packed image data."""
+    if not entry:
+        return None
+
+    permanent_name = entry['name']
+
     # Load and pack
     if permanent_name in bpy.data.images:
         bpy.data.images.remove(bpy.data.images[permanent_name])
 
-    img = bpy.data.images.load(permanent_path)
+    img = bpy.data.images.load(entry['path'])
     img.name = permanent_name
-    img.pack()
+    threading_utils.pack_image_bytes(img, image_data)
     img.use_fake_user = True
-    print(f"[NANO BANANA] History image packed: {permanent_name}")
+    logger.debug("History image packed: %s", permanent_name)
 
     # Add to history
     if hasattr(scene, 'gemini_render'):
         props = scene.gemini_render
         history_item = props.render_history.add()
-        history_item.prompt = user_prompt
+        history_item.prompt = entry['prompt']
+        history_item.prompt_preview = entry['prompt_preview']
         history_item.image_name = permanent_name
+        history_item.filepath = entry['path']
 
         if props.use_style_reference and props.style_reference_image:
             history_item.style_reference_used = True
@@ -447,16 +539,14 @@ def _save_render_to_history(image_data: bytes, user_prompt: str, scene):
         else:
             history_item.style_reference_used = False
 
-        history_item.timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        history_item.timestamp = entry['timestamp']
         history_item.thumbnail_name = ""
 
-        while len(props.render_history) > 10:
-            oldest = props.render_history[0]
-            if oldest.image_name in bpy.data.images:
-                bpy.data.images.remove(bpy.data.images[oldest.image_name])
-            props.render_history.remove(0)
+        threading_utils.trim_render_history(props)
+
+        logger.info("History saved: %s, total: %s", permanent_name, len(props.render_history))
 
-        print(f"[NANO BANANA] History saved: {permanent_name}, total: {len(props.render_history)}")
+    return img
 
 
 # --- Standard Blender Panels ---
@@ -512,31 +602,40 @@ def _on_engine_switch(scene):
         if not props:
             return
 
+        from . import ui_panel
         if props.render_mode == 'EEVEE':
             # Regular Render — show Material Preview with Combined pass
             for window in bpy.context.window_manager.windows:
-                for area in window.screen.areas:
-                    if area.type == 'VIEW_3D':
-                        for space in area.spaces:
-                            if space.type == 'VIEW_3D':
-                                space.shading.type = 'MATERIAL'
-                                if hasattr(space.shading, 'render_pass'):
-                                    space.shading.render_pass = 'COMBINED'
-                                if hasattr(space.shading, 'use_scene_lights'):
-                                    space.shading.use_scene_lights = True
-                        area.tag_redraw()
-                        return
+                area = ui_panel._find_view3d_area(window.screen)
+                if area is None:
+                    continue
+                # The active space of a VIEW_3D area is always the 3D view
+                ui_panel._set_shading(area.spaces.active.shading, type='MATERIAL',
+                                      render_pass='COMBINED', use_scene_lights=True)
+                area.tag_redraw()
+                return
         else:
             # Depth Map — show Material Preview with Mist pass
-            from . import ui_panel
+            # Force a re-apply: the mode itself has not changed since last time
+            ui_panel._last_render_mode.pop(scene.name, None)
             ui_panel.on_render_mode_change(props, bpy.context)
     except Exception as e:
-        print(f"[NANO BANANA] Engine switch viewport init error: {e}")
+        logger.error("Engine switch viewport init error: %s", e)
 
 
 @bpy.app.handlers.persistent
 def _depsgraph_update_handler(scene, depsgraph=None):
-    """Detect when render engine changes to NANO_BANANA and initialise viewport."""
+    """Detect when render engine changes to NANO_BANANA and initialise viewport.
+    Also drops cached depth maps once any mesh geometry has been edited."""
+    try:
+        if depsgraph is not None:
+            for update in depsgraph.updates:
+                if update.is_updated_geometry and isinstance(update.id, (bpy.types.Object, bpy.types.Mesh)):
+                    from . import depth_utils
+                    depth_utils.depth_cache.clear()
+                    break
+    except Exception:
+        pass
     try:
         current = scene.render.engine
         if current != _last_engine[0]:
@@ -549,6 +648,12 @@ def _depsgraph_update_handler(scene, depsgraph=None):
         pass
 
 
+def _render_mode_reset_handlers():
+    """Handler lists after which the render-mode guard must be forgotten."""
+    h = bpy.app.handlers
+    return (h.load_post, h.undo_post, h.redo_post)
+
+
 def register():
     bpy.utils.register_class(NanoBananaRenderEngine)
     bpy.utils.register_class(BananaOTRender)
@@ -570,6 +675,10 @@ def register():
     # Register engine-switch handler
     if _depsgraph_update_handler not in bpy.app.handlers.depsgraph_update_post:
         bpy.app.handlers.depsgraph_update_post.append(_depsgraph_update_handler)
+    from . import ui_panel
+    for handlers in _render_mode_reset_handlers():
+        if ui_panel.reset_render_mode_guard not in handlers:
+            handlers.append(ui_panel.reset_render_mode_guard)
     # Seed current engine so we don't trigger on addon load
     try:
         _last_engine[0] = bpy.context.scene.render.engine
@@ -581,6 +690,14 @@ def unregister():
     # Remove engine-switch handler
     if _depsgraph_update_handler in bpy.app.handlers.depsgraph_update_post:
         bpy.app.handlers.depsgraph_update_post.remove(_depsgraph_update_handler)
+    from . import ui_panel
+    for handlers in _render_mode_reset_handlers():
+        if ui_panel.reset_render_mode_guard in handlers:
+            handlers.remove(ui_panel.reset_render_mode_guard)
+    
+    from . import depth_utils
+    depth_utils.depth_cache.unpin()
+    depth_utils.depth_cache.clear()
 
     # Remove keymaps
     for km, kmi in addon_keymaps:
@@ -0,0 +1,93 @@
+"""
+On-disk cache of AI render results for Nano Banana Render addon.
+
+Results are stored as PNG files keyed by a hash of everything that was
+sent to the model (input image, reference image, prompt, model, size),
+so repeating an identical request can skip the network call.
+"""
+
+import os
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .log import logger
+
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+
+# Single writer so cache stores never block the render thread
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nano_banana_cache")
+
+
+def get_cache_dir() -> str:
+    """Get path to the result cache directory."""
+    cache_dir = os.path.join(tempfile.gettempdir(), "nano_banana_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def make_key(input_path: str, reference_path: Optional[str], prompt: str,
+             model: str, render_mode: str, width: int, height: int) -> str:
+    """Hash the request inputs into a cache key."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(input_path, "rb") as f:
+        h.update(f.read())
+    if reference_path:
+        with open(reference_path, "rb") as f:
+            h.update(f.read())
+    h.update(repr((prompt, model, render_mode, width, height)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def load(key: str) -> Optional[bytes]:
+    """Return cached result bytes, or None on a miss."""
+    path = os.path.join(get_cache_dir(), f"{key}.png")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # Touch so the size sweep evicts least recently used results first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def store(key: str, image_data: bytes) -> None:
+    """Write a result atomically (readers never see a partial file)."""
+    cache_dir = get_cache_dir()
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(image_data)
+        os.replace(tmp_path, os.path.join(cache_dir, f"{key}.png"))
+    except OSError as e:
+        logger.warning("Could not cache result: %s", e)
+
+
+def store_async(key: str, image_data: bytes) -> None:
+    """Queue a result write on the background writer."""
+    _writer.submit(store, key, image_data)
+
+
+def prune(max_bytes: int = MAX_CACHE_BYTES) -> None:
+    """Delete least recently used results until the cache fits in max_bytes."""
+    try:
+        entries = [e for e in os.scandir(get_cache_dir()) if e.is_file()]
+    except OSError:
+        return
+    stats = [(e.path, e.stat()) for e in entries]
+    total = sum(st.st_size for _, st in stats)
+    if total <= max_bytes:
+        return
+    for path, st in sorted(stats, key=lambda item: item[1].st_mtime):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= st.st_size
+        if total <= max_bytes:
+            break
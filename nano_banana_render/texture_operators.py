@@ -7,6 +7,7 @@ Operators:
   • BANANA_OT_preview_tex_camera  — Look through a specific camera
   • BANANA_OT_texture_draft       — Draft generation (mist collage → API → project)
   • BANANA_OT_texture_enhance     — Per-view enhancement with depth
+  • BANANA_OT_cancel_tex          — Cancel a running draft/enhance request
   • BANANA_OT_cleanup_tex         — Remove all temp pipeline data
 """
 
@@ -14,13 +15,14 @@ import bpy
 import os
 import tempfile
 import threading
-import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from bpy.types import Operator
 from bpy.props import IntProperty, StringProperty
 
 from . import texture_pipeline as pipe
 from . import beta_api
-from .threading_utils import execute_in_main_thread
+from .gemini_api import GeminiCancelledError
+from .threading_utils import execute_in_main_thread, submit_background_job
 from .render_engine import MODEL_MAP
 
 
@@ -31,6 +33,10 @@ COST_GRID = {
     'pro':   {'1024': 30, '2048': 45, '4096': 60},
 }
 
+# Cancel event of the most recently started job; BANANA_OT_cancel_tex sets it.
+# Each job owns its event, so starting a new job never un-cancels an older one.
+_active_tex_cancel = None
+
 
 def _get_cost(props) -> int:
     tier = 'pro' if props.ai_model == 'NANO_BANANA_PRO' else 'flash'
@@ -51,7 +57,8 @@ def _is_direct_api() -> bool:
 
 def _call_api_depth(prompt: str, model_name: str, depth_image_path: str,
                     reference_image_path: str = None,
-                    width: int = 1024, height: int = 1024):
+                    width: int = 1024, height: int = 1024,
+                    cancel_event: threading.Event = None):
     """Send a DEPTH MAP image to the AI for texture generation.
 
     Routes to direct Google API or Nanode server.
@@ -69,6 +76,7 @@ def _call_api_depth(prompt: str, model_name: str, depth_image_path: str,
             is_color_render=False,
             width=width,
             height=height,
+            cancel_event=cancel_event,
         )
         return image_data, 0, -1
 
@@ -87,7 +95,8 @@ def _call_api_depth(prompt: str, model_name: str, depth_image_path: str,
 
 def _call_api_enhance(prompt: str, model_name: str,
                       color_path: str, depth_path: str,
-                      width: int = 1024, height: int = 1024):
+                      width: int = 1024, height: int = 1024,
+                      cancel_event: threading.Event = None):
     """Send a COLOR render + DEPTH MAP for enhancement.
 
     The colour image is the base to improve; depth map provides geometry.
@@ -107,6 +116,7 @@ def _call_api_enhance(prompt: str, model_name: str,
             is_color_render=True,  # colour-based enhancement
             width=width,
             height=height,
+            cancel_event=cancel_event,
         )
         return image_data, 0, -1
 
@@ -192,15 +202,11 @@ def _set_processing(scene, val: bool):
     execute_in_main_thread(_upd)
 
 
-def _wait_for(box, label: str, timeout: int = 300):
-    """Block until box[0] is not None (or is an Exception)."""
-    elapsed = 0
-    while box[0] is None and elapsed < timeout:
-        time.sleep(0.2)
-        elapsed += 0.2
-    if isinstance(box[0], Exception):
-        raise box[0]
-    if box[0] is None:
+def _wait_for(future, label: str, timeout: int = 300):
+    """Block until a main-thread task finishes; re-raises its exception."""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
         raise RuntimeError(f"{label} timed out (>{timeout}s)")
 
 
@@ -366,69 +372,58 @@ class BananaOTTextureDraft(Operator):
                 ref_img.file_format = orig_fmt
             print(f"[TEX PIPE] Style reference saved: {ref_path}")
 
-        t = threading.Thread(
-            target=self._run_draft,
-            args=(scene, obj.name, cameras, props.tex_prompt,
-                  int(props.tex_resolution), props.ai_model,
-                  props.tex_depth_start, props.tex_depth_depth,
-                  props.mist_falloff, ref_path, props.tex_render_mode),
-            daemon=True,
+        global _active_tex_cancel
+        cancel_event = _active_tex_cancel = threading.Event()
+        submit_background_job(
+            self._run_draft,
+            scene, obj.name, cameras, props.tex_prompt,
+            int(props.tex_resolution), props.ai_model,
+            props.tex_depth_start, props.tex_depth_depth,
+            props.mist_falloff, ref_path, props.tex_render_mode,
+            cancel_event,
         )
-        t.start()
         return {'FINISHED'}
 
     @staticmethod
     def _run_draft(scene, obj_name, cameras, prompt, resolution,
                    ai_model, mist_start, mist_depth, mist_falloff,
-                   reference_path=None, render_mode='MIST'):
+                   reference_path=None, render_mode='MIST', cancel_event=None):
         try:
             tmp_dir = tempfile.mkdtemp(prefix=pipe.TEMP_PREFIX)
 
             # ─── Step 1: Render MIST views (main thread) ───
             _update_status(scene, "Rendering depth (mist) views...")
-            r = [None]
 
             def _do_mist_render():
+                snap = pipe._store_render_settings(scene)
                 try:
-                    snap = pipe._store_render_settings(scene)
-                    try:
-                        if render_mode == 'MIST':
-                            pipe.setup_mist_render(
-                                scene, resolution,
-                            )
-                            paths = pipe.render_all_views(
-                                scene, cameras, tmp_dir, "mist"
-                            )
-                        else:
-                            pipe.setup_flat_render(scene, resolution)
-                            paths = pipe.render_all_views(
-                                scene, cameras, tmp_dir, "color"
-                            )
-                        r[0] = paths
-                    finally:
-                        pipe._restore_render_settings(scene, snap)
-                except Exception as e:
-                    r[0] = e
+                    if render_mode == 'MIST':
+                        pipe.setup_mist_render(
+                            scene, resolution,
+                        )
+                        paths = pipe.render_all_views(
+                            scene, cameras, tmp_dir, "mist"
+                        )
+                    else:
+                        pipe.setup_flat_render(scene, resolution)
+                        paths = pipe.render_all_views(
+                            scene, cameras, tmp_dir, "color"
+                        )
+                    return paths
+                finally:
+                    pipe._restore_render_settings(scene, snap)
 
-            execute_in_main_thread(_do_mist_render)
-            _wait_for(r, "Mist render")
-            mist_paths = r[0]
+            mist_paths = _wait_for(execute_in_main_thread(_do_mist_render), "Mist render")
 
             # ─── Step 2: Assemble collage (main thread) ───
             _update_status(scene, "Building depth collage...")
-            c = [None]
 
             def _do_collage():
-                try:
-                    # Collage tiles match mist resolution (capped at 1024)
-                    mist_tile = min(resolution, 1024)
-                    c[0] = pipe.create_collage(mist_paths, mist_tile)
-                except Exception as e:
-                    c[0] = e
+                # Collage tiles match mist resolution (capped at 1024)
+                mist_tile = min(resolution, 1024)
+                return pipe.create_collage(mist_paths, mist_tile)
 
-            execute_in_main_thread(_do_collage)
-            _wait_for(c, "Collage")
-            collage_path = c[0]
+            collage_path = _wait_for(execute_in_main_thread(_do_collage), "Collage")
 
             # ─── Step 3: API call (bg thread OK) ───
             _update_status(scene, "Sending depth collage to AI...")
@@ -501,6 +496,7 @@ class BananaOTTextureDraft(Operator):
                 reference_image_path=reference_path,
                 width=req_w,
                 height=req_h,
+                cancel_event=cancel_event,
             )
 
             # Update balance
@@ -552,6 +548,9 @@ class BananaOTTextureDraft(Operator):
 
             execute_in_main_thread(_do_project)
 
+        except GeminiCancelledError:
+            _update_status(scene, "Cancelled")
+            _set_processing(scene, False)
         except beta_api.BetaAPIError as e:
             _update_status(scene, f"API Error: {e.message}")
             _set_processing(scene, False)
@@ -649,21 +648,22 @@ class BananaOTTextureEnhance(Operator):
                 ref_img.filepath_raw = orig_fp
                 ref_img.file_format = orig_fmt
 
-        t = threading.Thread(
-            target=self._run_enhance,
-            args=(scene, obj.name, cameras, props.tex_prompt,
-                  int(props.tex_resolution), props.ai_model,
-                  props.tex_depth_start, props.tex_depth_depth,
-                  props.mist_falloff, ref_path, props.tex_render_mode),
-            daemon=True,
+        global _active_tex_cancel
+        cancel_event = _active_tex_cancel = threading.Event()
+        submit_background_job(
+            self._run_enhance,
+            scene, obj.name, cameras, props.tex_prompt,
+            int(props.tex_resolution), props.ai_model,
+            props.tex_depth_start, props.tex_depth_depth,
+            props.mist_falloff, ref_path, props.tex_render_mode,
+            cancel_event,
         )
-        t.start()
         return {'FINISHED'}
 
     @staticmethod
     def _run_enhance(scene, obj_name, cameras, prompt, resolution,
                      ai_model, mist_start, mist_depth, mist_falloff,
-                     reference_path=None, render_mode='MIST'):
+                     reference_path=None, render_mode='MIST', cancel_event=None):
         try:
             tmp_dir = tempfile.mkdtemp(prefix=pipe.TEMP_PREFIX)
             model_name = MODEL_MAP.get(
@@ -673,52 +673,49 @@ class BananaOTTextureEnhance(Operator):
 
             # ── Step 1: Render all colour + mist views (main thread) ──
             _update_status(scene, "Rendering colour + depth views...")
-            r = [None]
 
             def _do_renders():
+                snap = pipe._store_render_settings(scene)
                 try:
-                    snap = pipe._store_render_settings(scene)
-                    try:
-                        results = {}
-
-                        # Mist renders (viewport approach) - only if MIST mode
-                        if render_mode == 'MIST':
-                            pipe.setup_mist_render(
-                                scene, resolution,
-                            )
-                            for cam_info in cameras:
-                                d_path = os.path.join(
-                                    tmp_dir,
-                                    f"enh_depth_{cam_info['name']}.png"
-                                )
-                                pipe.render_single_view_mist(
-                                    scene, cam_info['camera'], d_path
-                                )
-                                results.setdefault(
-                                    cam_info['name'], {}
-                                )['depth'] = d_path
-
-                        # Colour renders (flat render)
-                        pipe.setup_flat_render(scene, resolution)
-                        for cam_info in cameras:
-                            c_path = os.path.join(
+                    results = {}
+
+                    # Mist renders (viewport approach) - only if MIST mode
+                    if render_mode == 'MIST':
+                        pipe.setup_mist_render(
+                            scene, resolution,
+                        )
+                        depth_paths = {
+                            cam_info['name']: os.path.join(
                                 tmp_dir,
-                                f"enh_color_{cam_info['name']}.png"
+                                f"enh_depth_{cam_info['name']}.png"
                             )
-                            pipe.render_single_view(
-                                scene, cam_info['camera'], c_path
-                            )
-                            results.setdefault(cam_info['name'], {})['color'] = c_path
-
-                        r[0] = results
-                    finally:
-                        pipe._restore_render_settings(scene, snap)
-                except Exception as e:
-                    r[0] = e
-
-            execute_in_main_thread(_do_renders)
-            _wait_for(r, "Renders")
-            render_results = r[0]
+                            for cam_info in cameras
+                        }
+                        # One viewport setup/restore for the whole batch
+                        pipe.render_views_mist(scene, [
+                            (cam_info['camera'], depth_paths[cam_info['name']])
+                            for cam_info in cameras
+                        ])
+                        for name, d_path in depth_paths.items():
+                            results.setdefault(name, {})['depth'] = d_path
+
+                    # Colour renders (flat render)
+                    pipe.setup_flat_render(scene, resolution)
+                    for cam_info in cameras:
+                        c_path = os.path.join(
+                            tmp_dir,
+                            f"enh_color_{cam_info['name']}.png"
+                        )
+                        pipe.render_single_view(
+                            scene, cam_info['camera'], c_path
+                        )
+                        results.setdefault(cam_info['name'], {})['color'] = c_path
+
+                    return results
+                finally:
+                    pipe._restore_render_settings(scene, snap)
+
+            render_results = _wait_for(execute_in_main_thread(_do_renders), "Renders")
 
             # ── Step 2: Parallel API calls ──
             _update_status(scene, f"Enhancing {total} views (parallel)...")
@@ -815,6 +812,7 @@ class BananaOTTextureEnhance(Operator):
                     depth_path=paths.get('depth'),
                     width=resolution,
                     height=resolution,
+                    cancel_event=cancel_event,
                 )
 
                 enh_path = os.path.join(
@@ -883,6 +881,9 @@ class BananaOTTextureEnhance(Operator):
 
             execute_in_main_thread(_do_final)
 
+        except GeminiCancelledError:
+            _update_status(scene, "Cancelled")
+            _set_processing(scene, False)
         except beta_api.BetaAPIError as e:
             _update_status(scene, f"API Error: {e.message}")
             _set_processing(scene, False)
@@ -893,6 +894,29 @@ class BananaOTTextureEnhance(Operator):
             _set_processing(scene, False)
 
 
+# ──────────────────────────────────────────────────────────────────
+#  Operator: Cancel
+# ──────────────────────────────────────────────────────────────────
+
+class BananaOTCancelTex(Operator):
+    """Cancel the running texture generation"""
+    bl_idname = "banana.cancel_tex"
+    bl_label = "Cancel"
+    bl_description = "Abort the running draft/enhance request (direct Google API only)"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        props = getattr(context.scene, 'gemini_render', None)
+        return props is not None and props.tex_is_processing
+
+    def execute(self, context):
+        if _active_tex_cancel is not None:
+            _active_tex_cancel.set()
+        context.scene.gemini_render.tex_status = "Cancelling..."
+        return {'FINISHED'}
+
+
 # ──────────────────────────────────────────────────────────────────
 #  Operator: Cleanup
 # ──────────────────────────────────────────────────────────────────
@@ -960,6 +984,7 @@ texture_operator_classes = (
     BananaOTPreviewTexCamera,
     BananaOTTextureDraft,
     BananaOTTextureEnhance,
+    BananaOTCancelTex,
     BananaOTCleanupTex,
     BananaOTClearTexReference,
     BananaOTLoadTexReference,
@@ -77,13 +77,20 @@ def generate_camera_views(preset=PRESET_CUBE, include_top=True,
     return views
 
 
+_VIEW_DIRS = None
+
+
 def _name_to_pos_dir(name):
     """Get pos_dir from camera view name (searches all presets)."""
-    for preset in (PRESET_CUBE, PRESET_RING_8, PRESET_HEMI_10):
-        for v in generate_camera_views(preset, True, True):
-            if v['name'] == name:
-                return v['pos_dir']
-    return None
+    global _VIEW_DIRS
+    if _VIEW_DIRS is None:
+        # Built once; camera slider updates look up every camera by name
+        _VIEW_DIRS = {}
+        for preset in (PRESET_CUBE, PRESET_RING_8, PRESET_HEMI_10):
+            for v in generate_camera_views(preset, True, True):
+                _VIEW_DIRS.setdefault(v['name'], v['pos_dir'])
+    pos_dir = _VIEW_DIRS.get(name)
+    return pos_dir.copy() if pos_dir is not None else None
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -215,21 +222,25 @@ def update_cameras(distance: float = 0, ortho_scale: float = 0,
     if target_obj is None:
         return
 
+    prefix = TEMP_PREFIX + "cam_"
+    cams = []
+    for obj in bpy.data.objects:
+        if not obj.name.startswith(prefix):
+            continue
+        pos_dir = _name_to_pos_dir(obj.name[len(prefix):])
+        if pos_dir is not None:
+            cams.append((obj, pos_dir))
+    # Slider ticks without cameras must not pay for the bbox + view layer update
+    if not cams:
+        return
+
     center, dims = _bbox_world(target_obj)
     diag = dims.length
 
     used_dist = distance if distance > 0 else diag * 2.0
     used_ortho = ortho_scale if ortho_scale > 0 else max(dims) * 1.15
 
-    prefix = TEMP_PREFIX + "cam_"
-    for obj in bpy.data.objects:
-        if not obj.name.startswith(prefix):
-            continue
-        view_name = obj.name[len(prefix):]
-        pos_dir = _name_to_pos_dir(view_name)
-        if pos_dir is None:
-            continue
-
+    for obj, pos_dir in cams:
         obj.location = center + pos_dir.normalized() * used_dist
         obj.rotation_euler = _look_at_euler(pos_dir)
         obj.data.ortho_scale = used_ortho
@@ -483,6 +494,17 @@ def render_single_view_mist(scene, camera_obj, output_path: str):
     3. Disable overlays + gizmos
     4. bpy.ops.render.opengl(write_still=True)
     """
+    render_views_mist(scene, [(camera_obj, output_path)])
+    return output_path
+
+
+def render_views_mist(scene, jobs: list):
+    """Render the MIST pass for several (camera, output_path) jobs.
+
+    The viewport is looked up and switched to MIST shading once, every
+    job is rendered back-to-back, and the original state is restored
+    once at the end instead of after every view.
+    """
     import bpy
 
     # ── Find 3D viewport ──
@@ -525,9 +547,6 @@ def render_single_view_mist(scene, camera_obj, output_path: str):
     old_persp = space_data.region_3d.view_perspective if space_data.region_3d else None
 
     try:
-        # ── Set camera ──
-        scene.camera = camera_obj
-
         # ── Switch viewport to CAMERA VIEW ──
         if space_data.region_3d:
             space_data.region_3d.view_perspective = 'CAMERA'
@@ -548,12 +567,10 @@ def render_single_view_mist(scene, camera_obj, output_path: str):
             space_data.show_gizmo_navigate = False
 
         # ── Render output settings (same as depth_utils) ──
-        scene.render.filepath = output_path
         scene.render.image_settings.file_format = 'PNG'
         scene.render.image_settings.color_mode = 'RGB'
         scene.render.image_settings.color_depth = '8'
 
-        # ── Execute viewport render (exact same as depth_utils) ──
         override_context = {
             'window': viewport_window,
             'screen': viewport_screen,
@@ -563,10 +580,13 @@ def render_single_view_mist(scene, camera_obj, output_path: str):
             'space_data': space_data,
         }
 
+        # ── Execute viewport renders (exact same as depth_utils) ──
         with bpy.context.temp_override(**override_context):
-            bpy.ops.render.opengl(write_still=True)
-
-        print(f"[TEX PIPE] Mist rendered: {output_path}")
+            for camera_obj, output_path in jobs:
+                scene.camera = camera_obj
+                scene.render.filepath = output_path
+                bpy.ops.render.opengl(write_still=True)
+                print(f"[TEX PIPE] Mist rendered: {output_path}")
 
     finally:
         # ── Restore everything (same order as depth_utils) ──
@@ -587,7 +607,7 @@ def render_single_view_mist(scene, camera_obj, output_path: str):
         scene.camera = old_cam
         scene.render.filepath = old_filepath
 
-    return output_path
+    return [output_path for _, output_path in jobs]
 
 
 def render_single_view(scene, camera_obj, output_path: str):
@@ -611,19 +631,19 @@ def render_all_views(scene, cameras: list, output_dir: str,
       'mist'   — viewport mist pass (depth maps)
       'color'  — normal Eevee/Workbench render
     """
-    paths = []
-    for cam_info in cameras:
-        name = cam_info['name']
-        filename = f"{TEMP_PREFIX}{render_type}_{name}.png"
-        out_path = os.path.join(output_dir, filename)
+    jobs = [
+        (cam_info['camera'],
+         os.path.join(output_dir, f"{TEMP_PREFIX}{render_type}_{cam_info['name']}.png"))
+        for cam_info in cameras
+    ]
 
-        if render_type == "mist":
-            render_single_view_mist(scene, cam_info['camera'], out_path)
-        else:
-            render_single_view(scene, cam_info['camera'], out_path)
+    if render_type == "mist":
+        # One viewport setup/restore for the whole batch
+        return render_views_mist(scene, jobs)
 
-        paths.append(out_path)
-    return paths
+    for camera_obj, out_path in jobs:
+        render_single_view(scene, camera_obj, out_path)
+    return [out_path for _, out_path in jobs]
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -745,6 +765,8 @@ def mask_with_depth(texture_paths: list, depth_paths: list) -> list:
     This eliminates any silhouette deviations the AI introduced.
     Returns the same paths (files are modified in-place).
     """
+    import numpy as np
+
     if len(texture_paths) != len(depth_paths):
         print(f"[TEX PIPE] mask_with_depth: mismatch "
               f"({len(texture_paths)} tex vs {len(depth_paths)} depth)")
@@ -761,21 +783,21 @@ def mask_with_depth(texture_paths: list, depth_paths: list) -> list:
         if dw != tw or dh != th:
             depth_img.scale(tw, th)
 
-        tex_px = list(tex_img.pixels)
-        depth_px = list(depth_img.pixels)
-        total = tw * th
-
-        for i in range(total):
-            # Depth pixel luminance (any channel — they're grayscale)
-            d = depth_px[i * 4]  # R channel
-            if d < 0.01:
-                # Background — force black
-                tex_px[i * 4 + 0] = 0.0
-                tex_px[i * 4 + 1] = 0.0
-                tex_px[i * 4 + 2] = 0.0
-                tex_px[i * 4 + 3] = 1.0
-
-        tex_img.pixels = tex_px
+        # Bulk copies into float32 arrays; the mask is one vectorised pass
+        tex_px = np.empty(tw * th * tex_img.channels, dtype=np.float32)
+        tex_img.pixels.foreach_get(tex_px)
+        depth_px = np.empty(tw * th * depth_img.channels, dtype=np.float32)
+        depth_img.pixels.foreach_get(depth_px)
+        tex_px = tex_px.reshape(-1, tex_img.channels)
+
+        # Depth pixel luminance (any channel — they're grayscale)
+        background = depth_px[::depth_img.channels] < 0.01
+        # Background — force black
+        tex_px[background, :3] = 0.0
+        if tex_img.channels == 4:
+            tex_px[background, 3] = 1.0
+
+        tex_img.pixels.foreach_set(tex_px.ravel())
         tex_img.filepath_raw = tex_path
         tex_img.file_format = 'PNG'
         tex_img.save()
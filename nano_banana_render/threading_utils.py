@@ -1,58 +1,94 @@
 import bpy
+import itertools
+import os
+import queue
+import tempfile
 import threading
-from queue import Queue
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Callable, Any, Optional
-import time
+from dataclasses import dataclass
+
+from . import history_previews
+from .log import logger
 
 class BlenderThreadManager:
     """Manager for thread-safe operations with Blender"""
     
     def __init__(self):
-        self.command_queue = Queue()
+        # SimpleQueue locks internally, so the handoff stays safe without the GIL
+        self.command_queue = queue.SimpleQueue()
         self.timer_registered = False
+        self._timer_lock = threading.Lock()
         
-    def execute_in_main_thread(self, func: Callable, *args, **kwargs) -> None:
-        """Execute function in main Blender thread via timer"""
-        self.command_queue.put((func, args, kwargs))
+    def execute_in_main_thread(self, func: Callable, *args, **kwargs) -> Future:
+        """Execute function in main Blender thread via a one-shot timer.
+        Returns a Future resolved with the function's result (or exception).
+        """
+        future = Future()
+        self.command_queue.put((func, args, kwargs, future))
         
-        # Register timer if not already registered
-        if not self.timer_registered:
-            bpy.app.timers.register(self._process_queue, first_interval=0.01)
-            self.timer_registered = True
+        # Wake the main thread only when there is work; the timer unregisters itself once drained
+        with self._timer_lock:
+            if not self.timer_registered:
+                bpy.app.timers.register(self._process_queue, first_interval=0.0)
+                self.timer_registered = True
+        return future
     
-    def _process_queue(self) -> float:
-        """Process queued commands in main thread"""
-        try:
-            while not self.command_queue.empty():
-                func, args, kwargs = self.command_queue.get_nowait()
-                try:
-                    func(*args, **kwargs)
-                except Exception as e:
-                    print(f"Error executing queued command: {e}")
-                    # Continue processing other commands
-                    
-            # Return interval for next check
-            return 0.1
-            
-        except Exception as e:
-            print(f"Error in queue processor: {e}")
-            return 0.5
+    def _process_queue(self) -> Optional[float]:
+        """Process queued commands in main thread, unregister when drained"""
+        # Snapshot the backlog first so the queue is not touched between commands
+        pending = []
+        while True:
+            try:
+                pending.append(self.command_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        for func, args, kwargs, future in pending:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                logger.warning("Error executing queued command: %s", e)
+                future.set_exception(e)
+                # Continue processing other commands
+        
+        with self._timer_lock:
+            # A worker may have queued something after the drain above
+            if not self.command_queue.empty():
+                return 0.0
+            self.timer_registered = False
+        return None
     
     def stop_timer(self) -> None:
         """Stop the timer (call when addon is unregistered)"""
-        if self.timer_registered:
-            try:
-                bpy.app.timers.unregister(self._process_queue)
-            except Exception:
-                pass
-            self.timer_registered = False
+        with self._timer_lock:
+            if self.timer_registered:
+                try:
+                    bpy.app.timers.unregister(self._process_queue)
+                except Exception:
+                    pass
+                self.timer_registered = False
 
 # Global thread manager instance
 _thread_manager = BlenderThreadManager()
 
-def execute_in_main_thread(func: Callable, *args, **kwargs) -> None:
+def execute_in_main_thread(func: Callable, *args, **kwargs) -> Future:
     """Convenience function to execute in main thread"""
-    _thread_manager.execute_in_main_thread(func, *args, **kwargs)
+    return _thread_manager.execute_in_main_thread(func, *args, **kwargs)
+
+# Long-lived workers for background jobs, so a click doesn't spawn a fresh thread
+_job_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nano_banana_job")
+
+def submit_background_job(func: Callable, *args, **kwargs) -> Future:
+    """Run func on the persistent background worker pool"""
+    return _job_executor.submit(func, *args, **kwargs)
+
+# F12 API calls get their own worker so renders never queue behind texture jobs (or vice versa)
+_render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nano_banana_render")
+
+def submit_render_job(func: Callable, *args, **kwargs) -> Future:
+    """Run func on the dedicated render worker"""
+    return _render_executor.submit(func, *args, **kwargs)
 
 def redraw_all_areas():
     """Force redraw of all areas to update UI."""
@@ -73,51 +109,39 @@ def set_image_in_all_editors(image, mode='VIEW'):
                         space.image = image
                         if mode:
                             space.mode = mode
-                        area.tag_redraw()
                         switched = True
+                # One redraw per editor area, not per space
+                area.tag_redraw()
     return switched
 
-def ensure_image_editor_visible(image):
-    """Ensure an Image Editor is visible showing the given image.
-    Will try to open a new window or repurpose a non-critical area if none found.
+def ensure_image_editor_visible(image, open_new_window: bool = False):
+    """Show the given image in the existing Image Editors.
+    Only opens a new window (an expensive wm operator) when explicitly requested.
     """
-    # 1. Try existing editors
     if set_image_in_all_editors(image):
         return True
-        
-    # 2. Try to open new window
+    
+    if not open_new_window:
+        return False
+    
     try:
         bpy.ops.wm.window_new()
         new_window = bpy.context.window_manager.windows[-1]
-        for area in new_window.screen.areas:
-            if area.type != 'IMAGE_EDITOR':
-                area.type = 'IMAGE_EDITOR'
-                for space in area.spaces:
-                    if space.type == 'IMAGE_EDITOR':
-                        space.image = image
-                        area.tag_redraw()
-                        return True
-    except Exception:
-        pass
-        
-    # 3. Last resort: Convert safe area in current window
-    SAFE_AREAS = ['TEXT_EDITOR', 'CONSOLE', 'INFO', 'FILE_BROWSER']
-    for area in bpy.context.screen.areas:
-        if area.type in SAFE_AREAS:
-            area.type = 'IMAGE_EDITOR'
-            for space in area.spaces:
-                if space.type == 'IMAGE_EDITOR':
-                    space.image = image
-                    area.tag_redraw()
-                    return True
-    return False
+        area = new_window.screen.areas[0]
+        area.type = 'IMAGE_EDITOR'
+        area.spaces.active.image = image
+        area.tag_redraw()
+        return True
+    except Exception as e:
+        logger.warning("Could not open result window: %s", e)
+        return False
 
 def update_render_status(scene, status_text: str, is_rendering: bool = None) -> None:
     """Update render status in UI (thread-safe)."""
     def _update():
         try:
-            if hasattr(scene, 'gemini_render'):
-                props = scene.gemini_render
+            props = getattr(scene, 'gemini_render', None)
+            if props is not None:
                 props.status_text = status_text
                 if is_rendering is not None:
                     props.is_rendering = is_rendering
@@ -128,640 +152,323 @@ def update_render_status(scene, status_text: str, is_rendering: bool = None) ->
                         if area.type in ('VIEW_3D', 'PROPERTIES'):
                             area.tag_redraw()
         except Exception as e:
-            print(f"[GEMINI] Error updating status: {e}")
+            logger.warning("Error updating status: %s", e)
     
     execute_in_main_thread(_update)
 
 
+def _save_with_save_render(reference_image, temp_path) -> bool:
+    """Encode through Blender's native image writer (no Python-side pixel copy).
+    save_render applies the scene view transform, so this is only the no-PIL fallback.
+    """
+    original_filepath = reference_image.filepath_raw
+    original_format = reference_image.file_format
+    try:
+        reference_image.filepath_raw = temp_path
+        reference_image.file_format = 'PNG'
+        reference_image.save_render(temp_path)
+        return os.path.getsize(temp_path) > 0
+    finally:
+        reference_image.filepath_raw = original_filepath
+        reference_image.file_format = original_format
+
 def _save_from_pixels(reference_image, temp_path) -> bool:
     try:
-        pixels = list(reference_image.pixels)
         width, height = reference_image.size
-        try:
-            from PIL import Image
-            import numpy as np
-            pixel_array = np.array(pixels).reshape((height, width, reference_image.channels))
-            if pixel_array.max() <= 1.0:
-                pixel_array = (pixel_array * 255).astype(np.uint8)
-            
-            if reference_image.channels == 4:
-                img = Image.fromarray(pixel_array, 'RGBA')
-            elif reference_image.channels == 3:
-                img = Image.fromarray(pixel_array, 'RGB')
-            else:
-                img = Image.fromarray(pixel_array[:,:,0], 'L')
-            img.save(temp_path, 'PNG')
-            return True
-        except ImportError:
-            print("[GEMINI] PIL not available, trying Blender save_render...")
-            original_settings = {
-                'filepath': reference_image.filepath,
-                'file_format': reference_image.file_format
-            }
-            reference_image.filepath_raw = temp_path
-            reference_image.file_format = 'PNG'
-            reference_image.save_render(temp_path)
-            reference_image.filepath = original_settings['filepath']
-            reference_image.file_format = original_settings['file_format']
-            return True
+        from PIL import Image
+        import numpy as np
+        # Bulk C-level copy instead of building a Python float per channel
+        buf = np.empty(width * height * reference_image.channels, dtype=np.float32)
+        reference_image.pixels.foreach_get(buf)
+        # Blender stores rows bottom-up, PIL expects top-down
+        pixel_array = buf.reshape((height, width, reference_image.channels))[::-1]
+        np.clip(pixel_array, 0.0, 1.0, out=pixel_array)
+        np.multiply(pixel_array, 255.0, out=pixel_array)
+        # Preallocated target: the only extra buffer is the 1-byte-per-channel output
+        u8 = np.empty(pixel_array.shape, dtype=np.uint8)
+        u8[...] = pixel_array
+        pixel_array = u8
+        
+        if reference_image.channels == 4:
+            img = Image.fromarray(pixel_array, 'RGBA')
+        elif reference_image.channels == 3:
+            img = Image.fromarray(pixel_array, 'RGB')
+        else:
+            img = Image.fromarray(pixel_array[:,:,0], 'L')
+        img.save(temp_path, 'PNG')
+        return True
+    except ImportError:
+        logger.warning("PIL not available, saving reference through save_render")
+    except Exception as e:
+        logger.warning("Pixel data method failed, trying save_render: %s", e)
+    
+    try:
+        return _save_with_save_render(reference_image, temp_path)
     except Exception as e:
-        print(f"[GEMINI] Pixel data method failed: {e}")
+        logger.warning("save_render failed: %s", e)
         return False
 
-def _save_from_packed(reference_image, temp_path) -> bool:
+def _save_from_packed(data: bytes, dst) -> bool:
     try:
-        with open(temp_path, 'wb') as f:
-            f.write(reference_image.packed_file.data)
+        dst.write(data)
         return True
     except Exception as e:
-        print(f"[GEMINI] Packed file method failed: {e}")
+        logger.warning("Packed file method failed: %s", e)
         return False
 
-def _save_from_filepath(reference_image, temp_path) -> bool:
-    import os
+def _save_from_filepath(abs_path: str, dst) -> bool:
     import shutil
-    import bpy
     try:
-        abs_path = bpy.path.abspath(reference_image.filepath)
-        if os.path.exists(abs_path):
-            shutil.copy2(abs_path, temp_path)
-            return True
+        try:
+            src_size = os.stat(abs_path).st_size
+        except FileNotFoundError:
+            return False
+        # Kernel-side copy; metadata is irrelevant for a temp upload file
+        with open(abs_path, 'rb') as src:
+            try:
+                offset = 0
+                while offset < src_size:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), offset, src_size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except (AttributeError, OSError):
+                # No sendfile for regular files on this platform (e.g. Windows)
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        return True
     except Exception as e:
-        print(f"[GEMINI] Filepath method failed: {e}")
+        logger.warning("Filepath method failed: %s", e)
     return False
 
-def save_reference_image_temp(scene) -> Optional[str]:
-    """Save reference image from scene properties to temporary file."""
+# Per-session temp directory; file names come from a counter instead of mkstemp
+_temp_dir = None
+_temp_dir_lock = threading.Lock()
+_temp_counter = itertools.count()
+
+def _temp_file_path(prefix: str, suffix: str = '.png') -> str:
+    global _temp_dir
+    with _temp_dir_lock:
+        if _temp_dir is None:
+            _temp_dir = tempfile.TemporaryDirectory(prefix="nano_banana_")
+        return os.path.join(_temp_dir.name, f"{prefix}_{next(_temp_counter)}{suffix}")
+
+def cleanup_temp_dir() -> None:
+    """Remove the session temp directory (call on addon unregister)."""
+    global _temp_dir
+    with _temp_dir_lock:
+        if _temp_dir is not None:
+            _temp_dir.cleanup()
+            _temp_dir = None
+
+def capture_reference_image(scene):
+    """Read the style reference from scene data (main thread only).
+    
+    Returns None, ('packed', bytes), ('file', abs_path) or ('temp', path).
+    Images without a file are encoded right away since that needs RNA;
+    the other two sources are written by write_reference_image().
+    """
+    props = getattr(scene, 'gemini_render', None)
+    if not props or not props.use_style_reference or not props.style_reference_image:
+        return None
+    
+    reference_image = props.style_reference_image
+    if not reference_image.filepath:
+        temp_path = _temp_file_path("ref")
+        if _save_from_pixels(reference_image, temp_path):
+            return ('temp', temp_path)
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        return None
+    if reference_image.packed_file:
+        return ('packed', bytes(reference_image.packed_file.data))
+    return ('file', bpy.path.abspath(reference_image.filepath))
+
+def write_reference_image(source) -> Optional[str]:
+    """Write a captured reference to a temp file (no bpy access, safe on workers)."""
+    if source is None:
+        return None
+    kind, value = source
+    if kind == 'temp':
+        return value
+    
+    temp_path = _temp_file_path("ref")
     try:
-        import tempfile
-        import os
-        
-        props = scene.gemini_render if hasattr(scene, 'gemini_render') else None
-        if not props or not props.use_style_reference or not props.style_reference_image:
-            return None
-            
-        reference_image = props.style_reference_image
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-            temp_path = temp_file.name
+        fd = os.open(temp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o600)
+        with os.fdopen(fd, 'wb') as dst:
+            if kind == 'packed':
+                saved_successfully = _save_from_packed(value, dst)
+            else:
+                saved_successfully = _save_from_filepath(value, dst)
         
-        # Save image using different methods based on image type
+        # Check if saving was successful (one stat covers existence and size)
+        saved_successfully = saved_successfully and os.stat(temp_path).st_size > 0
+    except OSError as e:
+        logger.warning("Error writing reference image: %s", e)
         saved_successfully = False
-        
-        if not reference_image.filepath:
-            saved_successfully = _save_from_pixels(reference_image, temp_path)
-        elif reference_image.packed_file:
-            saved_successfully = _save_from_packed(reference_image, temp_path)
-        elif reference_image.filepath:
-            saved_successfully = _save_from_filepath(reference_image, temp_path)
-        
-        # Check if saving was successful
-        if saved_successfully and os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
-            return temp_path
-        else:
-            try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-            except OSError:
-                pass
-            return None
-            
+    
+    if saved_successfully:
+        return temp_path
+    try:
+        os.unlink(temp_path)
+    except OSError:
+        pass
+    return None
+
+def save_reference_image_temp(scene) -> Optional[str]:
+    """Save reference image from scene properties to temporary file."""
+    try:
+        return write_reference_image(capture_reference_image(scene))
     except Exception as e:
-        print(f"[GEMINI] Error saving reference image: {e}")
+        logger.warning("Error saving reference image: %s", e)
         return None
 
-def load_result_image(image_data: bytes, image_name: str = "AI_Result", user_prompt: str = "") -> None:
-    """Load result image into Blender and save to history (thread-safe)."""
-    def _load_image():
-        try:
-            import tempfile
-            import os
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
-                f.write(image_data)
-                temp_path = f.name
-            
-            try:
-                # For history: save a PERMANENT copy that won't be deleted
-                permanent_path = None
-                permanent_image_for_history = None
-                
-                if user_prompt:
-                    import datetime
-                    timestamp_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    permanent_name = f"AI_Result_{timestamp_str}"
-                    
-                    # Save to a stable location (Blender temp dir)
-                    permanent_dir = os.path.join(tempfile.gettempdir(), "nano_banana_history")
-                    os.makedirs(permanent_dir, exist_ok=True)
-                    permanent_path = os.path.join(permanent_dir, f"{permanent_name}.png")
-                    
-                    import shutil
-                    shutil.copy2(temp_path, permanent_path)
-                    print(f"[GEMINI] Saved permanent copy: {permanent_path}")
-                    
-                    # Load the PERMANENT copy into Blender (not the temp file)
-                    if permanent_name in bpy.data.images:
-                        bpy.data.images.remove(bpy.data.images[permanent_name])
-                    
-                    permanent_image_for_history = bpy.data.images.load(permanent_path)
-                    permanent_image_for_history.name = permanent_name
-                    
-                    # Pack into blend file so it survives even if file is deleted
-                    try:
-                        permanent_image_for_history.pack()
-                    except Exception as e:
-                        print(f"[GEMINI] Warning: Could not pack history image: {e}")
-                    
-                    permanent_image_for_history.use_fake_user = True
-                    print(f"[GEMINI] Saved permanent image for history: {permanent_name}")
-                
-                # Load main image from temp file
-                if image_name in bpy.data.images:
-                    bpy.data.images.remove(bpy.data.images[image_name])
-                
-                img = bpy.data.images.load(temp_path)
-                img.name = image_name
-                
-                # Create Render Result copy
-                render_result = bpy.data.images.get('Render Result')
-                if render_result:
-                    bpy.data.images.remove(render_result)
-                
-                render_result = img.copy()
-                render_result.name = 'Render Result'
-                
-                # Pack the render result too
-                try:
-                    render_result.pack()
-                except Exception:
-                    pass
-                
-                # Update Image Editors and ensure one is visible
-                ensure_image_editor_visible(render_result)
-                
-                # Add to render history
-                if user_prompt and permanent_image_for_history:
-                    try:
-                        scene = bpy.context.scene
-                        
-                        if hasattr(scene, 'gemini_render'):
-                            props = scene.gemini_render
-                            
-                            # Create history entry
-                            history_item = props.render_history.add()
-                            history_item.prompt = user_prompt
-                            history_item.image_name = permanent_image_for_history.name
-                            if hasattr(history_item, 'filepath'):
-                                history_item.filepath = permanent_path
-                            
-                            # Save style reference info if used
-                            if props.use_style_reference and props.style_reference_image:
-                                history_item.style_reference_used = True
-                                history_item.style_reference_name = props.style_reference_image.name
-                                history_item.style_reference_thumbnail = ""
-                            else:
-                                history_item.style_reference_used = False
-                            
-                            # Add timestamp
-                            import datetime
-                            history_item.timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            history_item.thumbnail_name = ""
-                            
-                            # Keep only last 10 renders
-                            while len(props.render_history) > 10:
-                                oldest = props.render_history[0]
-                                if oldest.image_name in bpy.data.images:
-                                    bpy.data.images.remove(bpy.data.images[oldest.image_name])
-                                props.render_history.remove(0)
-                            
-                            print(f"[GEMINI] History saved: {permanent_image_for_history.name}, total: {len(props.render_history)}")
-                        
-                    except Exception as e:
-                        print(f"[GEMINI] Failed to save to history: {e}")
-                        import traceback
-                        print(f"[GEMINI] History error traceback: {traceback.format_exc()}")
-                
-            finally:
-                # Clean up temporary file (permanent copy was already made)
-                try:
-                    os.unlink(temp_path)
-                except OSError:
-                    pass
-                    
-        except Exception as e:
-            print(f"Error loading result image: {e}")
-    
-    execute_in_main_thread(_load_image)
+MAX_RENDER_HISTORY = 10
 
+def get_render_history_limit() -> int:
+    """Gallery size from addon preferences (MAX_RENDER_HISTORY if unavailable)."""
+    prefs = bpy.context.preferences.addons.get("nano_banana_render")
+    return getattr(prefs.preferences, 'max_render_history', MAX_RENDER_HISTORY) if prefs else MAX_RENDER_HISTORY
 
-class APIThread(threading.Thread):
-    """Background thread for API calls only (render happens in main thread)"""
-    
-    def __init__(self, scene, api_client, user_prompt: str, depth_path: str):
-        super().__init__(daemon=True)
-        self.scene = scene
-        self.api_client = api_client
-        self.user_prompt = user_prompt
-        self.depth_path = depth_path
-        self._stop_event = threading.Event()
-        print("[GEMINI] APIThread initialized")
-    
-    def stop(self):
-        """Request thread to stop"""
-        print("[GEMINI] Stop requested for APIThread")
-        self._stop_event.set()
-    
 
-    def _execute_depth_render(self, props):
-        render_result = None
-        depth_path = None
-        mist_start = props.mist_start if props else 5.0
-        mist_depth = props.mist_depth if props else 25.0
-        mist_falloff = getattr(props, 'mist_falloff', 'LINEAR')
-        
-        def _do_safe_mist_render():
-            nonlocal render_result, depth_path
-            try:
-                depth_path = self.depth_renderer.render_depth_map_mist(
-                    self.scene, mist_start, mist_depth, mist_falloff
-                )
-                render_result = "success"
-                print(f"[GEMINI] Mist depth render completed: {depth_path}")
-            except Exception as e:
-                render_result = f"error: {str(e)}"
-                print(f"[GEMINI] Mist render error: {str(e)}")
-                
-        print("[GEMINI] Executing mist render in main thread for safety...")
-        execute_in_main_thread(_do_safe_mist_render)
-        return render_result, depth_path
-
-    def _execute_eevee_render(self):
-        render_result = None
-        depth_path = None
-        def _do_safe_eevee_render():
-            nonlocal render_result, depth_path
-            try:
-                depth_path = self.depth_renderer.render_regular_eevee(self.scene)
-                render_result = "success"
-                print(f"[GEMINI] Regular Eevee render completed: {depth_path}")
-            except Exception as e:
-                render_result = f"error: {str(e)}"
-                print(f"[GEMINI] Regular render error: {str(e)}")
-                
-        print("[GEMINI] Executing Eevee render in main thread for safety...")
-        execute_in_main_thread(_do_safe_eevee_render)
-        return render_result, depth_path
+def trim_render_history(props, limit: int = None) -> None:
+    """Drop the oldest history entries (and their images) beyond `limit`."""
+    if limit is None:
+        limit = get_render_history_limit()
+    history = props.render_history
+    excess = len(history) - limit
+    if excess <= 0:
+        return
+    # Free images first so removals don't interleave with collection shifts
+    stale = [history[i] for i in range(excess)]
+    stale_names = [name for item in stale
+                   for name in (item.image_name, item.style_reference_thumbnail) if name]
+    for item in stale:
+        history_previews.release_preview(item.filepath)
+    for name in stale_names:
+        image = bpy.data.images.get(name)
+        if image:
+            bpy.data.images.remove(image)
+    for _ in range(excess):
+        history.remove(0)
 
-    def run(self):
-        """Main thread execution - API calls only"""
-        print("🚀 [GEMINI] APIThread starting execution...")
-        
-        try:
-            if self._stop_event.is_set():
-                print("[GEMINI] Stopped before API call")
-                return
-            
-            # Send to AI
-            print("[GEMINI] Step 1: Sending to Gemini AI...")
-            update_render_status(self.scene, "Sending to AI...", True)
-            
-            # Check for reference image
-            reference_path = save_reference_image_temp(self.scene)
-            
-            # Get resolution with aspect ratio from scene
-            props = self.scene.gemini_render if hasattr(self.scene, 'gemini_render') else None
-            base = int(props.resolution) if props else 1024
-            
-            # Get aspect ratio from scene render settings
-            render = self.scene.render
-            scene_aspect = render.resolution_x / render.resolution_y
-            if scene_aspect >= 1.0:
-                width, height = base, int(base / scene_aspect)
-            else:
-                width, height = int(base * scene_aspect), base
-            print(f"[GEMINI] Using resolution: {width}x{height} (aspect from scene: {render.resolution_x}x{render.resolution_y})")
-            
-            try:
-                image_data, _ = self.api_client.generate_image(self.depth_path, self.user_prompt, reference_path, width=width, height=height)
-                print(f"[GEMINI] AI response received, image size: {len(image_data)} bytes")
-            finally:
-                # Clean up reference temp file
-                if reference_path:
-                    try:
-                        import os
-                        os.unlink(reference_path)
-                        print("[GEMINI] Reference temp file cleaned up")
-                    except OSError:
-                        pass
-            
-            if self._stop_event.is_set():
-                print("[GEMINI] Stopped after AI response")
-                return
-            
-            # Load result
-            print("[GEMINI] Step 2: Loading result into Blender...")
-            update_render_status(self.scene, "📥 Loading result...", True)
-            print(f"[GEMINI] About to call load_result_image with user_prompt: '{self.user_prompt}' (length: {len(self.user_prompt) if self.user_prompt else 0})")
-            load_result_image(image_data, "Gemini_AI_Result", self.user_prompt)
-            
-            # Success
-            print("🎉 [GEMINI] AI render completed successfully!")
-            update_render_status(self.scene, "AI render completed successfully!", False)
-            
-        except Exception as e:
-            error_msg = f"Error: {str(e)}"
-            print(f"[GEMINI] API thread error: {error_msg}")
-            print(f"[GEMINI] Exception type: {type(e).__name__}")
-            import traceback
-            print(f"[GEMINI] Full traceback:\n{traceback.format_exc()}")
-            
-            update_render_status(self.scene, error_msg, False)
-            
-        finally:
-            print("[GEMINI] API thread cleanup starting...")
-            # Cleanup depth file if needed
-            try:
-                import os
-                if os.path.exists(self.depth_path):
-                    os.remove(self.depth_path)
-                    print(f"[GEMINI] Cleaned up depth file: {self.depth_path}")
-            except Exception as cleanup_error:
-                print(f"[GEMINI] Cleanup warning: {cleanup_error}")
-            print("[GEMINI] APIThread finished")
-
-class FullRenderThread(threading.Thread):
-    """Background thread for full render pipeline with proper context handling"""
-    
-    def __init__(self, context, depth_renderer, api_client, user_prompt: str):
-        super().__init__(daemon=True)
-        # Store only what we need from context
-        self.scene = context.scene
-        self.view_layer = context.view_layer
-        # Store window manager for render operations
-        import bpy
-        self.window_manager = bpy.context.window_manager
-        
-        self.depth_renderer = depth_renderer
-        self.api_client = api_client
-        self.user_prompt = user_prompt
-        self._stop_event = threading.Event()
-        print("[GEMINI] FullRenderThread initialized")
-    
-    def stop(self):
-        """Request thread to stop"""
-        print("[GEMINI] Stop requested for FullRenderThread")
-        self._stop_event.set()
-    
-    def run(self):
-        """Main thread execution with proper context override"""
-        print("[GEMINI] FullRenderThread starting execution...")
-        
-        try:
-            # Update status
-            print("[GEMINI] Step 1: Updating status to 'rendering depth'")
-            update_render_status(self.scene, "Rendering depth map...", True)
-            
-            if self._stop_event.is_set():
-                print("[GEMINI] Stopped before depth render")
-                return
-            
-            # Get render mode from scene properties
-            props = self.scene.gemini_render if hasattr(self.scene, 'gemini_render') else None
-            render_mode = props.render_mode if props and hasattr(props, 'render_mode') else 'DEPTH'
-            
-            # Execute render based on mode
-            render_result = None
-            depth_path = None
-            
-            if render_mode == 'DEPTH':
-                # Depth Map (Mist) Mode
-                print("[GEMINI] Using DEPTH MAP (Mist) mode...")
-                
-                mist_start = props.mist_start if props else 5.0
-                mist_depth = props.mist_depth if props else 25.0
-                mist_falloff = props.mist_falloff if props and hasattr(props, 'mist_falloff') else 'LINEAR'
-                
-                def _do_safe_mist_render():
-                    nonlocal render_result, depth_path
-                    try:
-                        depth_path = self.depth_renderer.render_depth_map_mist(
-                            self.scene, mist_start, mist_depth, mist_falloff
-                        )
-                        render_result = "success"
-                        print(f"[GEMINI] Mist depth render completed: {depth_path}")
-                        
-                    except Exception as e:
-                        render_result = f"error: {str(e)}"
-                        print(f"[GEMINI] Mist render error in main thread: {str(e)}")
-                
-                # Execute mist render in main thread
-                print("[GEMINI] Executing mist render in main thread for safety...")
-                execute_in_main_thread(_do_safe_mist_render)
-                
-            else:
-                # Regular Eevee Render Mode
-                print("[GEMINI] Using REGULAR RENDER (Eevee) mode...")
-                
-                def _do_safe_eevee_render():
-                    nonlocal render_result, depth_path
-                    try:
-                        # Use regular render method
-                        depth_path = self.depth_renderer.render_regular_eevee(self.scene)
-                        render_result = "success"
-                        print(f"[GEMINI] Regular Eevee render completed: {depth_path}")
-                        
-                    except Exception as e:
-                        render_result = f"error: {str(e)}"
-                        print(f"[GEMINI] Eevee render error in main thread: {str(e)}")
-                
-                # Execute eevee render in main thread
-                print("[GEMINI] Executing regular Eevee render in main thread...")
-                execute_in_main_thread(_do_safe_eevee_render)
-            
-            # Wait for render completion
-            import time
-            timeout = 180  # 3 minutes timeout for mist render
-            elapsed = 0
-            while render_result is None and elapsed < timeout and not self._stop_event.is_set():
-                time.sleep(0.1)
-                elapsed += 0.1
-            
-            if self._stop_event.is_set():
-                print("[GEMINI] Stopped during mist render")
-                return
-            
-            if render_result is None:
-                raise RuntimeError("Mist render timeout - took longer than 3 minutes")
-            elif render_result.startswith("error:"):
-                raise RuntimeError(f"Mist render failed: {render_result[7:]}")
-            
-            if not depth_path:
-                raise RuntimeError("No depth path returned from mist render")
-            
-            # Continue with AI processing
-            print("[GEMINI] Step 2: Sending to Gemini AI...")
-            update_render_status(self.scene, "Sending to AI...", True)
-            
-            # Check for reference image
-            reference_path = save_reference_image_temp(self.scene)
-            
-            # Determine if using color render mode
-            is_color_render = (render_mode == 'EEVEE')
-            
-            # Get resolution with aspect ratio from scene
-            base = int(props.resolution) if props else 1024
-            render = self.scene.render
-            scene_aspect = render.resolution_x / render.resolution_y
-            if scene_aspect >= 1.0:
-                width, height = base, int(base / scene_aspect)
-            else:
-                width, height = int(base * scene_aspect), base
-            print(f"[GEMINI] Using resolution: {width}x{height} (aspect from scene: {render.resolution_x}x{render.resolution_y})")
-            
-            try:
-                image_data, _ = self.api_client.generate_image(depth_path, self.user_prompt, reference_path, is_color_render, width=width, height=height)
-                print(f"[GEMINI] AI response received, image size: {len(image_data)} bytes")
-            finally:
-                # Clean up reference temp file
-                if reference_path:
-                    try:
-                        import os
-                        os.unlink(reference_path)
-                        print("[GEMINI] Reference temp file cleaned up")
-                    except OSError:
-                        pass
-                        
-                # CRITICAL: Clean up depth temp files after API usage
-                try:
-                    self.depth_renderer.cleanup_temp_files()
-                    print("[GEMINI] Depth temp files cleaned up after API usage")
-                except Exception as cleanup_error:
-                    print(f"[GEMINI] Depth cleanup warning: {cleanup_error}")
-            
-            if self._stop_event.is_set():
-                print("[GEMINI] Stopped after AI response")
-                return
-            
-            # Load result
-            print("[GEMINI] Step 3: Loading result into Blender...")
-            update_render_status(self.scene, "📥 Loading result...", True)
-            print(f"[GEMINI] About to call load_result_image with user_prompt: '{self.user_prompt}' (length: {len(self.user_prompt) if self.user_prompt else 0})")
-            load_result_image(image_data, "Gemini_AI_Result", self.user_prompt)
-            
-            # Success
-            print("🎉 [GEMINI] AI render completed successfully!")
-            update_render_status(self.scene, "AI render completed successfully!", False)
-            
-        except Exception as e:
-            error_msg = f"Error: {str(e)}"
-            print(f"[GEMINI] Full render thread error: {error_msg}")
-            print(f"[GEMINI] Exception type: {type(e).__name__}")
-            import traceback
-            print(f"[GEMINI] Full traceback:\n{traceback.format_exc()}")
-            
-            update_render_status(self.scene, error_msg, False)
-            
-        finally:
-            print("[GEMINI] Full render thread cleanup starting...")
-            # Note: Depth temp files are now cleaned up after API usage, not here
-            print("[GEMINI] FullRenderThread finished")
-    
-    def _render_depth_with_override(self, override_context):
-        """Render depth with context override"""
-        import bpy
-        
-        scene = override_context['scene']
-        view_layer = override_context['view_layer']
-        
-        # Setup scene
-        print("[GEMINI] Setting up depth render...")
-        
-        # Store original settings
-        original_filepath = scene.render.filepath
-        original_use_nodes = scene.use_nodes
-        original_file_format = scene.render.image_settings.file_format
-        original_color_mode = scene.render.image_settings.color_mode
-        
-        # Create temp directory
-        import tempfile, os
-        temp_dir = tempfile.mkdtemp(prefix="gemini_depth_")
-        depth_file_path = os.path.join(temp_dir, "depth")
-        
+def decode_result_pixels(image_data: bytes, size: tuple = None):
+    """Decode image bytes into a flat bottom-up RGBA float buffer for foreach_set.
+    Does the flip and 0..1 scaling up front so the main thread only copies.
+    Optional size=(w, h) resizes first. Returns (pixels, width, height),
+    or None if PIL/numpy are unavailable.
+    """
+    try:
+        from PIL import Image
+        import numpy as np
+        import io
+    except ImportError:
+        return None
+    pil_img = Image.open(io.BytesIO(image_data)).convert('RGBA')
+    if size and pil_img.size != tuple(size):
+        pil_img = pil_img.resize(tuple(size), Image.LANCZOS)
+    width, height = pil_img.size
+    # Blender stores rows bottom-up: flip while converting to one contiguous float buffer
+    pixels = np.ascontiguousarray(np.asarray(pil_img)[::-1], dtype=np.float32).ravel()
+    pixels *= 1.0 / 255.0
+    return pixels, width, height
+
+def pack_image_bytes(img, image_data: bytes) -> None:
+    """Pack already-encoded bytes into the blend file instead of re-encoding the image."""
+    try:
+        img.pack(data=image_data, data_len=len(image_data))
+    except (TypeError, RuntimeError):
+        img.pack()
+
+def _load_image_from_bytes(image_data: bytes, image_name: str):
+    """Fallback: load image bytes into Blender via a temporary file."""
+    temp_path = _temp_file_path("result")
+    with open(temp_path, 'wb') as f:
+        f.write(image_data)
+    try:
+        img = bpy.data.images.load(temp_path)
+        img.name = image_name
+        pack_image_bytes(img, image_data)
+        return img
+    finally:
         try:
-            # Configure render settings
-            scene.render.filepath = depth_file_path
-            scene.render.image_settings.file_format = 'PNG'
-            scene.render.image_settings.color_mode = 'BW'
-            
-            # Setup compositor
-            scene.use_nodes = True
-            tree = scene.node_tree
-            tree.nodes.clear()
-            
-            # Create nodes
-            render_layers = tree.nodes.new(type='CompositorNodeRLayers')
-            render_layers.location = (0, 0)
-            
-            output_node = tree.nodes.new(type='CompositorNodeOutputFile')
-            output_node.location = (300, 0)
-            output_node.base_path = temp_dir
-            output_node.file_slots[0].path = "depth"
-            output_node.format.file_format = 'PNG'
-            output_node.format.color_mode = 'BW'
-            
-            # Enable depth pass
-            view_layer.use_pass_z = True
-            
-            # Connect depth output
-            if 'Depth' in render_layers.outputs:
-                tree.links.new(render_layers.outputs['Depth'], output_node.inputs[0])
-            elif 'Z' in render_layers.outputs:
-                tree.links.new(render_layers.outputs['Z'], output_node.inputs[0])
-            else:
-                print("[GEMINI] No depth pass found, using Image")
-                tree.links.new(render_layers.outputs['Image'], output_node.inputs[0])
-            
-            print("[GEMINI] Starting render operation...")
-            
-            # Use render operator with override
-            with bpy.context.temp_override(**override_context):
-                bpy.ops.render.render(write_still=True)
-            
-            print("[GEMINI] Render operation completed")
-            
-            # Find output file
-            possible_paths = [
-                os.path.join(temp_dir, "depth0001.png"),
-                os.path.join(temp_dir, "depth.png"),
-                depth_file_path + ".png"
-            ]
-            
-            actual_path = None
-            for path in possible_paths:
-                if os.path.exists(path):
-                    actual_path = path
-                    break
-            
-            if not actual_path:
-                raise RuntimeError("Depth render file not found")
-            
-            # Normalize depth map
-            normalized_path = self.depth_renderer._normalize_depth_map(
-                actual_path, self.normalize_mode, self.clip_start, self.clip_end
-            )
-            
-            return normalized_path
-            
-        finally:
-            # Restore settings
-            scene.render.filepath = original_filepath
-            scene.use_nodes = original_use_nodes
-            scene.render.image_settings.file_format = original_file_format
-            scene.render.image_settings.color_mode = original_color_mode
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+def image_from_result(image_name: str, image_data: bytes):
+    """Create (or replace) a packed image from an AI result (main thread only).
+    Loaded as a FILE image: a GENERATED one from images.new() ignores its
+    packed PNG and comes back blank after save and reopen.
+    """
+    existing = bpy.data.images.get(image_name)
+    if existing:
+        bpy.data.images.remove(existing)
+    return _load_image_from_bytes(image_data, image_name)
+
+# Small pool for file I/O that can run alongside the API request setup
+_io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nano_banana_io")
+
+def _remove_file(path: str) -> None:
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+            logger.debug("Cleaned up temp file: %s", path)
+    except Exception as cleanup_error:
+        logger.warning("Cleanup warning: %s", cleanup_error)
+
+def _cleanup_depth_files(depth_renderer) -> None:
+    try:
+        depth_renderer.cleanup_temp_files()
+        logger.debug("Depth temp files cleaned up after API usage")
+    except Exception as cleanup_error:
+        logger.warning("Depth cleanup warning: %s", cleanup_error)
+
+
+@dataclass(frozen=True, slots=True)
+class RenderJob:
+    """Render settings read from the scene once, on the main thread."""
+    render_mode: str
+    mist_start: float
+    mist_depth: float
+    mist_falloff: str
+    resolution: int
+    scene_width: int
+    scene_height: int
+    resolution_percentage: int = 100
+    ai_model: str = ''
+    prompt: str = ''
+    use_result_cache: bool = False
+
+    @classmethod
+    def from_scene(cls, scene) -> "RenderJob":
+        props = getattr(scene, 'gemini_render', None)
+        return cls(
+            render_mode=getattr(props, 'render_mode', 'DEPTH'),
+            mist_start=getattr(props, 'mist_start', 5.0),
+            mist_depth=getattr(props, 'mist_depth', 25.0),
+            mist_falloff=getattr(props, 'mist_falloff', 'LINEAR'),
+            resolution=int(getattr(props, 'resolution', 1024)),
+            scene_width=scene.render.resolution_x,
+            scene_height=scene.render.resolution_y,
+            resolution_percentage=scene.render.resolution_percentage,
+            ai_model=getattr(props, 'ai_model', ''),
+            prompt=getattr(props, 'prompt', ''),
+            use_result_cache=getattr(props, 'use_result_cache', False),
+        )
+
+    @property
+    def output_size(self) -> tuple:
+        """Final F12 buffer size after resolution_percentage."""
+        return (int(self.scene_width * self.resolution_percentage / 100),
+                int(self.scene_height * self.resolution_percentage / 100))
+
 
 def stop_thread_manager():
     """Stop the thread manager (call on addon unregister)"""
     _thread_manager.stop_timer()
+    cleanup_temp_dir()
@@ -6,6 +6,266 @@ from typing import Callable, Any, Optional
 from bpy.types import PropertyGroup, Panel
 from bpy.props import StringProperty, BoolProperty, EnumProperty, FloatProperty, IntProperty, CollectionProperty, PointerProperty
 
+from . import history_previews
+from . import texture_pipeline as pipe
+from .log import logger
+
+
+_RENDER_MODE_ITEMS = (
+    ('DEPTH', "Depth Map (Mist)", "Use mist pass for pure depth information — no textures/lighting needed"),
+    ('EEVEE', "Regular Render", "Use standard Eevee render — preserves colors, textures, and lighting"),
+)
+
+_MIST_FALLOFF_ITEMS = (
+    ('LINEAR', "Linear", "Linear depth gradient — smooth and even transition"),
+    ('QUADRATIC', "Quadratic", "Quadratic depth gradient — more contrast in middle range"),
+    ('INVERSE_QUADRATIC', "Inverse Quadratic", "Inverse quadratic — stronger contrast at distance"),
+)
+
+_AI_MODEL_ITEMS = (
+    ('NANO_BANANA_2', "Nano Banana 2", "gemini-3.1-flash-image-preview — Fast, balanced quality"),
+    ('NANO_BANANA_PRO', "Nano Banana Pro", "gemini-3-pro-image-preview — Highest quality, slower"),
+    ('NANO_BANANA', "Nano Banana", "gemini-2.5-flash-image — Basic, fastest"),
+)
+
+_RESOLUTION_ITEMS = (
+    ('1024', "1K", "Base 1024px (auto aspect ratio)"),
+    ('2048', "2K", "High resolution 2048px"),
+    ('4096', "4K", "Ultra high resolution 4096px"),
+)
+
+_TEX_RENDER_MODE_ITEMS = (
+    ('MIST', "Depth Map", "Render using distance-based mist"),
+    ('COLOR', "Workbench", "Render using standard Workbench engine"),
+)
+
+_TEX_RESOLUTION_ITEMS = (
+    ('1024', "1K", "1024×1024 per projection — fast, lower detail"),
+    ('2048', "2K", "2048×2048 per projection — balanced"),
+    ('4096', "4K", "4096×4096 per projection — highest projection detail"),
+)
+
+_TEX_CAMERA_PRESET_ITEMS = (
+    ('CUBE',    "Cube (4+)",
+     "4 side cameras (Front/Back/Left/Right) + optional Top/Bottom"),
+    ('RING_8',  "Ring (8+)",
+     "8 cameras evenly spaced around the model + optional Top/Bottom"),
+    ('HEMI_10', "Hemisphere (10+)",
+     "8 equator + 2 elevated cameras + optional Top/Bottom"),
+)
+
+
+# Gallery rows drawn per page; keeps redraw cost flat as the history grows
+HISTORY_PAGE_SIZE = 20
+
+
+# ─── Property update callbacks ───
+
+def _apply_world_mist(world, start: float, depth: float, falloff: str):
+    """Copy mist values onto the world, writing only the ones that differ.
+    Every RNA write tags the world for a depsgraph update, and these
+    callbacks fire on each slider step."""
+    ms = getattr(world, 'mist_settings', None)
+    if ms is None:
+        return
+    if not ms.use_mist:
+        ms.use_mist = True
+    if ms.start != start:
+        ms.start = start
+    if ms.depth != depth:
+        ms.depth = depth
+    if ms.falloff != falloff:
+        ms.falloff = falloff
+
+
+# Scene name -> True if the texturing depth sliders were the last to change
+# its mist (False for the main render mist sliders), since the last flush
+_mist_pending = {}
+
+
+def _flush_mist_settings():
+    """Timer callback: apply the latest mist values once per burst of updates."""
+    pending = list(_mist_pending.items())
+    _mist_pending.clear()
+    redraw = False
+    for name, from_tex in pending:
+        scene = bpy.data.scenes.get(name)
+        if scene is None or not scene.world:
+            continue
+        try:
+            props = scene.gemini_render
+            if from_tex:
+                _apply_world_mist(scene.world, props.tex_depth_start, props.tex_depth_depth, props.mist_falloff)
+                redraw = redraw or props.mist_preview
+            else:
+                _apply_world_mist(scene.world, props.mist_start, props.mist_depth, props.mist_falloff)
+        except Exception as e:
+            logger.warning("Failed to update mist settings: %s", e)
+    if redraw:
+        for window in bpy.context.window_manager.windows:
+            area = _find_view3d_area(window.screen)
+            if area is not None:
+                area.tag_redraw()
+    return None
+
+
+def _schedule_mist_flush(scene, from_tex: bool):
+    """Queue a world mist update for scene on the shared one-shot timer."""
+    # Ask the timer system, not _mist_pending: a file load drops non-persistent timers
+    if not bpy.app.timers.is_registered(_flush_mist_settings):
+        bpy.app.timers.register(_flush_mist_settings, first_interval=0.05)
+    _mist_pending[scene.name] = from_tex
+
+
+def update_mist_settings(self, context):
+    """Update world mist settings when main mist UI values change.
+    Slider drags fire this for every intermediate value, so the world
+    write is deferred to a short one-shot timer that applies only the last."""
+    _schedule_mist_flush(self.id_data, False)
+
+
+def update_tex_mist_settings(self, context):
+    """Update world mist settings from TEXTURE pipeline depth sliders."""
+    _schedule_mist_flush(self.id_data, True)
+
+
+def on_cam_settings_change(self, context):
+    """Auto-update existing cameras when distance/ortho_scale sliders change."""
+    try:
+        obj = context.active_object
+        if not obj or obj.type != 'MESH':
+            return
+        # update_cameras returns before any work when there are no pipeline cameras
+        pipe.update_cameras(
+            distance=self.tex_cam_distance,
+            ortho_scale=self.tex_cam_ortho_scale,
+            target_obj=obj,
+        )
+    except Exception as e:
+        logger.warning("Camera settings update failed: %s", e)
+
+# (screen pointer, area index) of the last 3D viewport found.
+# Indices rather than Python objects: stale non-ID struct pointers are not safe to touch.
+_view3d_cache = (0, -1)
+
+
+def _find_view3d_area(screen):
+    """Return the first 3D viewport area of screen, reusing the last lookup."""
+    global _view3d_cache
+    if screen is None:
+        return None
+    screen_ptr, index = _view3d_cache
+    areas = screen.areas
+    if screen_ptr == screen.as_pointer() and 0 <= index < len(areas):
+        area = areas[index]
+        if area.type == 'VIEW_3D':
+            return area
+    for index, area in enumerate(areas):
+        if area.type == 'VIEW_3D':
+            _view3d_cache = (screen.as_pointer(), index)
+            return area
+    return None
+
+
+# View3DShading property names, read once from RNA: which of render_pass,
+# use_scene_world, use_scene_lights exist depends on the Blender version
+_shading_props = None
+
+
+def _shading_has(name: str) -> bool:
+    """Return True if viewport shading exposes the property on this Blender."""
+    global _shading_props
+    if _shading_props is None:
+        _shading_props = frozenset(p.identifier for p in bpy.types.View3DShading.bl_rna.properties)
+    return name in _shading_props
+
+
+def _set_shading(shading, **values):
+    """Assign viewport shading values, skipping ones this Blender lacks or
+    that already match. Unchanged writes still notify and redraw the viewport."""
+    for name, value in values.items():
+        if name != 'type' and not _shading_has(name):
+            continue
+        if getattr(shading, name) != value:
+            setattr(shading, name, value)
+
+
+# Set while on_render_mode_change runs: it turns mist_preview off itself and
+# then configures the viewport, so the nested toggle callback has nothing to do
+_applying_render_mode = False
+
+
+def toggle_mist_preview(self, context):
+    """Toggle mist preview in 3D viewport."""
+    if _applying_render_mode:
+        return
+    try:
+        update_mist_settings(self, context)
+        
+        area = _find_view3d_area(context.screen)
+        if area is None:
+            return
+        render_pass = 'MIST' if self.mist_preview else 'COMBINED'
+        _set_shading(area.spaces.active.shading, type='MATERIAL', render_pass=render_pass)
+        area.tag_redraw()
+        
+    except Exception as e:
+        logger.warning("Failed to toggle mist preview: %s", e)
+
+def on_tex_render_mode_change(self, context):
+    """Handle texture render mode change — switch off mist preview if not mist."""
+    try:
+        if self.tex_render_mode == 'COLOR' and getattr(self, 'mist_preview', False):
+            self.mist_preview = False
+    except AttributeError:
+        pass
+
+# Render mode last applied per scene name. Blender runs update= even when the
+# enum is re-assigned its current value (file loads, scripted sets)
+_last_render_mode = {}
+
+
+@bpy.app.handlers.persistent
+def reset_render_mode_guard(*_args):
+    """load_post / undo_post / redo_post handler: forget the applied modes.
+    Another file or an undo step restores a viewport that may not match them."""
+    _last_render_mode.clear()
+
+
+def on_render_mode_change(self, context):
+    """Handle render mode change — switch viewport to match mode."""
+    global _applying_render_mode
+    scene_name = self.id_data.name
+    if _last_render_mode.get(scene_name) == self.render_mode:
+        return
+    _last_render_mode[scene_name] = self.render_mode
+    try:
+        # Disable mist preview if switching to EEVEE
+        if self.render_mode == 'EEVEE' and self.mist_preview:
+            _applying_render_mode = True
+            try:
+                self.mist_preview = False
+            finally:
+                _applying_render_mode = False
+        
+        # Auto-switch viewport shading to match render mode
+        area = _find_view3d_area(context.screen)
+        if area is None:
+            return
+        shading = area.spaces.active.shading
+        if self.render_mode == 'DEPTH':
+            # Switch to Material mode with Mist pass
+            _set_shading(shading, type='MATERIAL', render_pass='MIST', use_scene_world=True)
+            # Update mist settings so the preview is accurate
+            update_mist_settings(self, context)
+        else:
+            # Switch to Material Preview (EEVEE-like)
+            _set_shading(shading, type='MATERIAL', render_pass='COMBINED', use_scene_lights=True)
+        area.tag_redraw()
+    except Exception as e:
+        logger.warning("Render mode change error: %s", e)
+
+
 class GeminiRenderHistoryItem(PropertyGroup):
     """Single render history entry with visual preview"""
     
@@ -15,6 +275,12 @@ class GeminiRenderHistoryItem(PropertyGroup):
         default=""
     )
     
+    prompt_preview: StringProperty(
+        name="Prompt Preview",
+        description="Truncated prompt for the gallery",
+        default=""
+    )
+    
     timestamp: StringProperty(
         name="Timestamp", 
         description="When this render was created",
@@ -66,11 +332,7 @@ class GeminiRenderProperties(PropertyGroup):
     ai_model: EnumProperty(
         name="Model",
         description="Select which AI model to use for rendering",
-        items=[
-            ('NANO_BANANA_2', "Nano Banana 2", "gemini-3.1-flash-image-preview — Fast, balanced quality"),
-            ('NANO_BANANA_PRO', "Nano Banana Pro", "gemini-3-pro-image-preview — Highest quality, slower"),
-            ('NANO_BANANA', "Nano Banana", "gemini-2.5-flash-image — Basic, fastest"),
-        ],
+        items=_AI_MODEL_ITEMS,
         default='NANO_BANANA_PRO',
     )
     
@@ -87,6 +349,13 @@ class GeminiRenderProperties(PropertyGroup):
         name="Render History"
     )
     
+    history_page: IntProperty(
+        name="Gallery Page",
+        description="Page of the render gallery being shown (0 = newest)",
+        default=0,
+        min=0,
+    )
+    
     history_index: IntProperty(
         name="History Index",
         default=-1,
@@ -96,23 +365,16 @@ class GeminiRenderProperties(PropertyGroup):
     render_mode: EnumProperty(
         name="Render Mode",
         description="Choose between depth map (mist) or regular Eevee render",
-        items=[
-            ('DEPTH', "Depth Map (Mist)", "Use mist pass for pure depth information — no textures/lighting needed"),
-            ('EEVEE', "Regular Render", "Use standard Eevee render — preserves colors, textures, and lighting"),
-        ],
+        items=_RENDER_MODE_ITEMS,
         default='EEVEE',
-        update=lambda self, context: on_render_mode_change(self, context)
+        update=on_render_mode_change
     )
     
     # Resolution selection
     resolution: EnumProperty(
         name="Resolution",
         description="AI output resolution (aspect ratio auto-detected from scene/camera)",
-        items=[
-            ('1024', "1K", "Base 1024px (auto aspect ratio)"),
-            ('2048', "2K", "High resolution 2048px"),
-            ('4096', "4K", "Ultra high resolution 4096px"),
-        ],
+        items=_RESOLUTION_ITEMS,
         default='1024',
     )
     
@@ -124,7 +386,7 @@ class GeminiRenderProperties(PropertyGroup):
         min=0.01,
         max=1000.0,
         unit='LENGTH',
-        update=lambda self, context: update_mist_settings(self, context)
+        update=update_mist_settings
     )
     
     mist_depth: FloatProperty(
@@ -134,19 +396,15 @@ class GeminiRenderProperties(PropertyGroup):
         min=0.1,
         max=1000.0,
         unit='LENGTH',
-        update=lambda self, context: update_mist_settings(self, context)
+        update=update_mist_settings
     )
     
     mist_falloff: EnumProperty(
         name="Falloff",
         description="Mist falloff type — controls how depth gradient transitions",
-        items=[
-            ('LINEAR', "Linear", "Linear depth gradient — smooth and even transition"),
-            ('QUADRATIC', "Quadratic", "Quadratic depth gradient — more contrast in middle range"),
-            ('INVERSE_QUADRATIC', "Inverse Quadratic", "Inverse quadratic — stronger contrast at distance"),
-        ],
+        items=_MIST_FALLOFF_ITEMS,
         default='LINEAR',
-        update=lambda self, context: update_mist_settings(self, context)
+        update=update_mist_settings
     )
     
     # Preview mist in viewport
@@ -154,7 +412,7 @@ class GeminiRenderProperties(PropertyGroup):
         name="Preview Mist",
         description="Show mist effect in 3D viewport for easy depth adjustment",
         default=False,
-        update=lambda self, context: toggle_mist_preview(self, context)
+        update=toggle_mist_preview
     )
     
     # Style Reference Image
@@ -170,17 +428,17 @@ class GeminiRenderProperties(PropertyGroup):
         description="Reference image — AI will copy materials, colors, lighting, textures from this image while using depth map geometry"
     )
     
-    # UI state
-    show_settings: BoolProperty(
-        name="Show Settings",
-        description="Show advanced settings",
+    # Result display
+    auto_open_result_window: BoolProperty(
+        name="Open Result Window",
+        description="Open a new window with an Image Editor when no Image Editor is available to show the result",
         default=False,
     )
     
-    show_auth: BoolProperty(
-        name="Show Authentication",
-        description="Show authentication panel",
-        default=True,
+    use_result_cache: BoolProperty(
+        name="Reuse Identical Results",
+        description="Load the previous result instead of calling the AI when the input image, prompt, model and resolution are unchanged",
+        default=False,
     )
     
     # Status
@@ -240,12 +498,9 @@ class GeminiRenderProperties(PropertyGroup):
     tex_render_mode: EnumProperty(
         name="Render Mode",
         description="Type of image to render for AI generation",
-        items=[
-            ('MIST', "Depth Map", "Render using distance-based mist"),
-            ('COLOR', "Workbench", "Render using standard Workbench engine"),
-        ],
+        items=_TEX_RENDER_MODE_ITEMS,
         default='MIST',
-        update=lambda self, ctx: on_tex_render_mode_change(self, ctx)
+        update=on_tex_render_mode_change
     )
 
     tex_prompt: StringProperty(
@@ -264,11 +519,7 @@ class GeminiRenderProperties(PropertyGroup):
     tex_resolution: EnumProperty(
         name="Projection Resolution",
         description="Resolution of each AI projection view (per camera angle). This is NOT the final texture resolution — the texture is composited from multiple projections",
-        items=[
-            ('1024', "1K", "1024×1024 per projection — fast, lower detail"),
-            ('2048', "2K", "2048×2048 per projection — balanced"),
-            ('4096', "4K", "4096×4096 per projection — highest projection detail"),
-        ],
+        items=_TEX_RESOLUTION_ITEMS,
         default='1024',
     )
 
@@ -295,14 +546,7 @@ class GeminiRenderProperties(PropertyGroup):
     tex_camera_preset: EnumProperty(
         name="Camera Layout",
         description="Choose how cameras are arranged around the model",
-        items=[
-            ('CUBE',    "Cube (4+)",
-             "4 side cameras (Front/Back/Left/Right) + optional Top/Bottom"),
-            ('RING_8',  "Ring (8+)",
-             "8 cameras evenly spaced around the model + optional Top/Bottom"),
-            ('HEMI_10', "Hemisphere (10+)",
-             "8 equator + 2 elevated cameras + optional Top/Bottom"),
-        ],
+        items=_TEX_CAMERA_PRESET_ITEMS,
         default='CUBE',
     )
 
@@ -313,7 +557,7 @@ class GeminiRenderProperties(PropertyGroup):
         min=0.0,
         max=500.0,
         unit='LENGTH',
-        update=lambda self, ctx: on_cam_settings_change(self, ctx),
+        update=on_cam_settings_change,
     )
 
     tex_cam_ortho_scale: FloatProperty(
@@ -322,7 +566,7 @@ class GeminiRenderProperties(PropertyGroup):
         default=0.0,
         min=0.0,
         max=500.0,
-        update=lambda self, ctx: on_cam_settings_change(self, ctx),
+        update=on_cam_settings_change,
     )
 
     # Depth settings for texture pipeline — update mist live
@@ -333,7 +577,7 @@ class GeminiRenderProperties(PropertyGroup):
         min=0.001,
         max=100.0,
         unit='LENGTH',
-        update=lambda self, ctx: update_tex_mist_settings(self, ctx),
+        update=update_tex_mist_settings,
     )
 
     tex_depth_depth: FloatProperty(
@@ -343,7 +587,7 @@ class GeminiRenderProperties(PropertyGroup):
         min=0.1,
         max=200.0,
         unit='LENGTH',
-        update=lambda self, ctx: update_tex_mist_settings(self, ctx),
+        update=update_tex_mist_settings,
     )
 
     # Pipeline state
@@ -371,6 +615,31 @@ class GeminiRenderProperties(PropertyGroup):
 
 # ─── Main Panel (like Render settings header in Cycles) ───
 
+# Credits per render by model tier and resolution
+_COST_GRID = {
+    'flash': {'1024': 10, '2048': 15, '4096': 60},
+    'pro':   {'1024': 30, '2048': 45, '4096': 60},
+}
+
+
+# (feedback box prompt, feedback button text) per account type
+_FEEDBACK_LABELS = {
+    'api': ("Leave feedback (min. 50 chars):", "Leave Feedback"),
+    'credit': ("Leave feedback (min. 50 chars) for +50 Credits!", "Leave Feedback (+50 Credits)"),
+    'beta': ("Leave feedback (min. 50 chars) for +50 Gens!", "Leave Feedback (+50 Gens)"),
+}
+
+
+def _auth_state(context):
+    """Return (has_token, is_credit_user, is_api_user) from one prefs lookup.
+    Panels redraw continuously, so the token is fetched and stripped once."""
+    prefs = context.preferences.addons.get("nano_banana_render")
+    token = getattr(prefs.preferences, 'beta_token', "").strip() if prefs else ""
+    if not token:
+        return False, False, False
+    return True, token.startswith("nk_"), token.startswith("AIza")
+
+
 class BananaPTRenderPanel(Panel):
     """Nano Banana main settings — appears under Render Properties when engine is selected"""
     bl_label = "Nano Banana"
@@ -396,20 +665,13 @@ class BananaPTRenderPanel(Panel):
         layout.prop(props, "ai_model")
         
         # Credit cost hint for current model
-        prefs = context.preferences.addons.get("nano_banana_render")
-        has_token = prefs and hasattr(prefs.preferences, 'beta_token') and prefs.preferences.beta_token.strip()
-        is_credit_user = has_token and prefs.preferences.beta_token.strip().startswith("nk_")
-        is_api_user = has_token and prefs.preferences.beta_token.strip().startswith("AIza")
+        has_token, is_credit_user, is_api_user = _auth_state(context)
         
         if is_credit_user:
             # Cost per model+resolution
             model_tier = 'pro' if props.ai_model == 'NANO_BANANA_PRO' else 'flash'
-            cost_grid = {
-                'flash': {'1024': 10, '2048': 15, '4096': 60},
-                'pro':   {'1024': 30, '2048': 45, '4096': 60},
-            }
             res = getattr(props, 'resolution', '1024')
-            cost = cost_grid.get(model_tier, cost_grid['pro']).get(res, 30)
+            cost = _COST_GRID.get(model_tier, _COST_GRID['pro']).get(res, 30)
             row = layout.row()
             row.scale_y = 0.7
             row.label(text=f"Cost: {cost} credits per render")
@@ -421,12 +683,13 @@ class BananaPTRenderPanel(Panel):
         else:
             if not is_api_user:
                 # Balance display
+                balance = props.beta_balance
                 row = layout.row()
-                if props.beta_balance >= 0:
+                if balance >= 0:
                     if is_credit_user:
-                        row.label(text=f"Credits: {props.beta_balance}")
+                        row.label(text=f"Credits: {balance}")
                     else:
-                        row.label(text=f"Generations left: {props.beta_balance}")
+                        row.label(text=f"Generations left: {balance}")
                 else:
                     if is_credit_user:
                         row.label(text="Account Active", icon='LINKED')
@@ -436,7 +699,7 @@ class BananaPTRenderPanel(Panel):
                 
                 # Buy Credits button for credit users (on the same row)
                 if is_credit_user:
-                    if props.beta_balance >= 0 and props.beta_balance < 30:
+                    if 0 <= balance < 30:
                         row.alert = True
                     row.operator("banana.open_store", text="Buy Credits", icon='PLUS')
                 
@@ -451,40 +714,34 @@ class BananaPTRenderPanel(Panel):
                     op_dislike.rating = "dislike"
             
             # ─── Feedback section ─────────────────────────────
-            if is_api_user:
-                bonus_label = ""
-            elif is_credit_user:
-                bonus_label = "+50 Credits"
-            else:
-                bonus_label = "+50 Gens"
+            account = 'api' if is_api_user else 'credit' if is_credit_user else 'beta'
+            prompt_label, button_label = _FEEDBACK_LABELS[account]
             
+            has_submitted = props.has_submitted_feedback
             if props.show_feedback:
                 box = layout.box()
-                if props.has_submitted_feedback:
+                if has_submitted:
                     box.label(text="Leave additional feedback:", icon='INFO')
                 else:
-                    if bonus_label:
-                        box.label(text=f"Leave feedback (min. 50 chars) for {bonus_label}!", icon='INFO')
-                    else:
-                        box.label(text="Leave feedback (min. 50 chars):", icon='INFO')
+                    box.label(text=prompt_label, icon='INFO')
                 box.prop(props, "feedback_text", text="")
                 row = box.row()
                 row.enabled = len(props.feedback_text.strip()) >= 50
                 row.operator("banana.send_feedback", text="Submit Feedback", icon='CHECKMARK')
             else:
                 row = layout.row()
-                if props.has_submitted_feedback:
+                if has_submitted:
                     row.operator(OP_TOGGLE_FEEDBACK, text="Thanks for your Feedback!", icon='HEART')
                 else:
-                    text = "Leave Feedback (" + bonus_label + ")" if bonus_label else "Leave Feedback"
-                    row.operator(OP_TOGGLE_FEEDBACK, text=text, icon='GREASEPENCIL')
+                    row.operator(OP_TOGGLE_FEEDBACK, text=button_label, icon='GREASEPENCIL')
         
         # Status (only show during/after render)
-        if props.status_text and props.status_text != "Ready":
+        status_text = props.status_text
+        if status_text and status_text != "Ready":
             layout.separator()
             box = layout.box()
             status_icon = 'TIME' if props.is_rendering else 'INFO'
-            box.label(text=props.status_text, icon=status_icon)
+            box.label(text=status_text, icon=status_icon)
 
 
 # ─── Prompt Sub-panel ───
@@ -536,6 +793,8 @@ class BananaPTRenderMode(Panel):
         
         layout.prop(props, "render_mode", text="Mode")
         layout.prop(props, "resolution")
+        layout.prop(props, "auto_open_result_window")
+        layout.prop(props, "use_result_cache")
         
         # Warn if 2K/4K selected with Nano Banana (gemini-2.5-flash only supports 1K)
         if props.ai_model == 'NANO_BANANA' and props.resolution != '1024':
@@ -617,10 +876,13 @@ class BananaPTStyleReference(Panel):
         row = layout.row()
         row.operator("gemini.load_image_as_reference", text="Load from File", icon='FILEBROWSER')
         
-        if props.style_reference_image:
+        ref_image = props.style_reference_image
+        if ref_image:
+            # One size read: each Image.size access goes through the image buffer
+            width, height = ref_image.size
             col = layout.column(align=True)
             col.scale_y = 0.8
-            col.label(text=f"{props.style_reference_image.size[0]}×{props.style_reference_image.size[1]}", icon='IMAGE_DATA')
+            col.label(text=f"{width}×{height}", icon='IMAGE_DATA')
 
 
 # ─── Render Gallery Sub-panel ───
@@ -638,24 +900,39 @@ class BananaPTHistoryPanel(Panel):
     
     @classmethod
     def poll(cls, context):
-        return context.engine in cls.COMPAT_ENGINES
+        # No gallery until the first render: Blender then skips draw() entirely
+        return (context.engine in cls.COMPAT_ENGINES
+                and len(context.scene.gemini_render.render_history) > 0)
     
     def draw(self, context):
         layout = self.layout
         scene = context.scene
         props = scene.gemini_render
         
-        if len(props.render_history) == 0:
-            layout.label(text="No renders yet", icon='INFO')
-            return
+        history = props.render_history
+        n = len(history)
+        layout.label(text=f"{n} renders", icon='IMAGE_DATA')
+        
+        # Clamp here too: deletions can leave history_page past the last page
+        page_count = (n + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+        page = min(props.history_page, page_count - 1)
+        newest = n - 1 - page * HISTORY_PAGE_SIZE
+        oldest = max(newest - HISTORY_PAGE_SIZE + 1, 0)
         
-        layout.label(text=f"{len(props.render_history)} renders", icon='IMAGE_DATA')
+        if page_count > 1:
+            row = layout.row(align=True)
+            sub = row.row(align=True)
+            sub.enabled = page > 0
+            sub.operator("gemini.history_page", text="", icon='TRIA_LEFT').step = -1
+            row.label(text=f"Page {page + 1} / {page_count}")
+            sub = row.row(align=True)
+            sub.enabled = page < page_count - 1
+            sub.operator("gemini.history_page", text="", icon='TRIA_RIGHT').step = 1
         
         # Gallery — newest first, giant thumbnails
-        from . import history_previews
-        for i, item in enumerate(reversed(props.render_history)):
-            actual_index = len(props.render_history) - 1 - i
-            render_number = len(props.render_history) - i
+        for actual_index in range(newest, oldest - 1, -1):
+            item = history[actual_index]
+            render_number = actual_index + 1
             
             box = layout.box()
             
@@ -674,7 +951,8 @@ class BananaPTHistoryPanel(Panel):
                 col.label(text="Loading Preview...", icon='IMAGE_DATA')
             
             # Prompt preview
-            prompt_preview = item.prompt[:60] + "..." if len(item.prompt) > 60 else item.prompt
+            # Entries saved before prompt_preview existed get one truncated from the prompt
+            prompt_preview = item.prompt_preview or history_previews.make_prompt_preview(item.prompt)
             box.label(text=prompt_preview, icon='TEXT')
             
             # Actions row
@@ -686,134 +964,8 @@ class BananaPTHistoryPanel(Panel):
             gear_btn.history_index = actual_index
 
 
-
 # ─── Helper functions ───
 
-def update_mist_settings(self, context):
-    """Update world mist settings when main mist UI values change."""
-    try:
-        if not context.scene.world:
-            return
-        world = context.scene.world
-        mist_start_m = self.mist_start
-        mist_depth_m = self.mist_depth
-        mist_falloff = self.mist_falloff if hasattr(self, 'mist_falloff') else 'LINEAR'
-        if hasattr(world, 'mist_settings'):
-            world.mist_settings.use_mist = True
-            world.mist_settings.start = mist_start_m
-            world.mist_settings.depth = mist_depth_m
-            world.mist_settings.falloff = mist_falloff
-    except Exception as e:
-        print(f"[GEMINI] Failed to update mist settings: {e}")
-
-
-def update_tex_mist_settings(self, context):
-    """Update world mist settings from TEXTURE pipeline depth sliders."""
-    try:
-        world = context.scene.world
-        if not world:
-            return
-        start = self.tex_depth_start
-        depth = self.tex_depth_depth
-        falloff = self.mist_falloff if hasattr(self, 'mist_falloff') else 'LINEAR'
-        if hasattr(world, 'mist_settings'):
-            world.mist_settings.use_mist = True
-            world.mist_settings.start = start
-            world.mist_settings.depth = depth
-            world.mist_settings.falloff = falloff
-        # Refresh viewport if mist preview is on
-        if self.mist_preview:
-            for area in context.screen.areas:
-                if area.type == 'VIEW_3D':
-                    area.tag_redraw()
-    except Exception as e:
-        print(f"[TEX] Failed to update tex mist settings: {e}")
-
-
-def on_cam_settings_change(self, context):
-    """Auto-update existing cameras when distance/ortho_scale sliders change."""
-    try:
-        obj = context.active_object
-        if not obj or obj.type != 'MESH':
-            return
-        from . import texture_pipeline as pipe
-        # Only update if cameras already exist
-        if not any(o.name.startswith(pipe.TEMP_PREFIX + "cam_")
-                   for o in bpy.data.objects):
-            return
-        pipe.update_cameras(
-            distance=self.tex_cam_distance,
-            ortho_scale=self.tex_cam_ortho_scale,
-            target_obj=obj,
-        )
-    except Exception as e:
-        print(f"[TEX] Camera settings update failed: {e}")
-
-def toggle_mist_preview(self, context):
-    """Toggle mist preview in 3D viewport."""
-    try:
-        update_mist_settings(self, context)
-        
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                for space in area.spaces:
-                    if space.type == 'VIEW_3D':
-                        if self.mist_preview:
-                            space.shading.type = 'MATERIAL'
-                            if hasattr(space.shading, 'render_pass'):
-                                space.shading.render_pass = 'MIST'
-                        else:
-                            if hasattr(space.shading, 'render_pass'):
-                                space.shading.render_pass = 'COMBINED'
-                            space.shading.type = 'MATERIAL'
-                        area.tag_redraw()
-                        return
-        
-    except Exception as e:
-        print(f"[GEMINI] Failed to toggle mist preview: {e}")
-
-def on_tex_render_mode_change(self, context):
-    """Handle texture render mode change — switch off mist preview if not mist."""
-    try:
-        if self.tex_render_mode == 'COLOR' and getattr(self, 'mist_preview', False):
-            self.mist_preview = False
-    except AttributeError:
-        pass
-
-def on_render_mode_change(self, context):
-    """Handle render mode change — switch viewport to match mode."""
-    try:
-        # Disable mist preview if switching to EEVEE
-        if self.render_mode == 'EEVEE' and self.mist_preview:
-            self.mist_preview = False
-        
-        # Auto-switch viewport shading to match render mode
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                for space in area.spaces:
-                    if space.type == 'VIEW_3D':
-                        if self.render_mode == 'DEPTH':
-                            # Switch to Material mode with Mist pass
-                            space.shading.type = 'MATERIAL'
-                            if hasattr(space.shading, 'render_pass'):
-                                space.shading.render_pass = 'MIST'
-                            if hasattr(space.shading, 'use_scene_world'):
-                                space.shading.use_scene_world = True
-                            # Update mist settings so the preview is accurate
-                            update_mist_settings(self, context)
-                        else:
-                            # Switch to Material Preview (EEVEE-like)
-                            space.shading.type = 'MATERIAL'
-                            if hasattr(space.shading, 'render_pass'):
-                                space.shading.render_pass = 'COMBINED'
-                            if hasattr(space.shading, 'use_scene_lights'):
-                                space.shading.use_scene_lights = True
-                        area.tag_redraw()
-                        return
-    except Exception as e:
-        print(f"[NANO BANANA] Render mode change error: {e}")
-
-
 def get_render_dimensions_from_scene(context) -> tuple:
     """Get render dimensions from scene settings with base resolution scaling."""
     try:
@@ -883,13 +1035,7 @@ class BananaPTTexturingNpanel(Panel):
         obj = context.active_object
 
         # ── Auth ──
-        prefs = context.preferences.addons.get("nano_banana_render")
-        has_token = (prefs and hasattr(prefs.preferences, 'beta_token')
-                     and prefs.preferences.beta_token.strip())
-        is_direct_api = (has_token and
-                         prefs.preferences.beta_token.strip().startswith("AIza"))
-        is_credit_user = (has_token and
-                          prefs.preferences.beta_token.strip().startswith("nk_"))
+        has_token, is_credit_user, is_direct_api = _auth_state(context)
 
         if not has_token:
             box = layout.box()
@@ -925,16 +1071,18 @@ class BananaPTTexturingNpanel(Panel):
         row = ref_box.row(align=True)
         row.prop(props, "tex_reference_image", text="")
         row.operator("banana.load_tex_reference", text="", icon='FILEBROWSER')
-        if props.tex_reference_image:
+        tex_ref = props.tex_reference_image
+        if tex_ref:
             row.operator("banana.clear_tex_reference", text="", icon='X')
-            ref_box.label(text=f"✓ {props.tex_reference_image.name}", icon='CHECKMARK')
+            ref_box.label(text=f"✓ {tex_ref.name}", icon='CHECKMARK')
 
         # ── Balance & Credits ──
         if is_credit_user:
             box = layout.box()
             row = box.row(align=True)
-            if props.beta_balance >= 0:
-                row.label(text=f"Credits: {props.beta_balance}")
+            balance = props.beta_balance
+            if balance >= 0:
+                row.label(text=f"Credits: {balance}")
             else:
                 row.label(text="Credits: ...")
             row.operator("banana.refresh_balance", text="", icon='FILE_REFRESH')
@@ -950,9 +1098,10 @@ class BananaPTTexturingNpanel(Panel):
 
         # ── Feedback ──
         if hasattr(props, 'show_feedback'):
+            has_submitted = props.has_submitted_feedback
             if props.show_feedback:
                 fb_box = layout.box()
-                if props.has_submitted_feedback:
+                if has_submitted:
                     fb_box.label(text="Leave additional feedback:", icon='INFO')
                 else:
                     fb_box.label(text="Feedback (50+ chars) for +50 generations!", icon='INFO')
@@ -962,13 +1111,22 @@ class BananaPTTexturingNpanel(Panel):
                 row.operator("banana.send_feedback", text="Submit Feedback", icon='CHECKMARK')
             else:
                 row = layout.row()
-                if props.has_submitted_feedback:
+                if has_submitted:
                     row.operator(OP_TOGGLE_FEEDBACK, text="Thanks for your Feedback!", icon='CHECKMARK')
                 else:
                     row.operator(OP_TOGGLE_FEEDBACK, text="Leave Feedback (+50 Credits)", icon='OUTLINER_OB_LIGHT')
 
         layout.separator()
 
+        # One pass over bpy.data.objects serves every camera check below
+        cam_prefix = pipe.TEMP_PREFIX + "cam_"
+        view_names = sorted(
+            o.name[len(cam_prefix):]
+            for o in bpy.data.objects
+            if o.name.startswith(cam_prefix)
+        )
+        has_cams = bool(view_names)
+
         # ═══════════════ Camera Setup ═══════════════
         cam_box = layout.box()
         cam_head = cam_box.row()
@@ -989,15 +1147,11 @@ class BananaPTTexturingNpanel(Panel):
             col.prop(props, "tex_cam_ortho_scale", text="Ortho Scale")
     
             # Init / Update camera buttons
-            from . import texture_pipeline as _pipe
-            num_cams = len(_pipe.generate_camera_views(
+            num_cams = len(pipe.generate_camera_views(
                 props.tex_camera_preset,
                 props.tex_include_top,
                 props.tex_include_bottom,
             ))
-            has_cams = any(
-                o.name.startswith("nb_tex_cam_") for o in bpy.data.objects
-            )
     
             row = cam_box.row(align=True)
             row.scale_y = 1.3
@@ -1014,13 +1168,6 @@ class BananaPTTexturingNpanel(Panel):
                 cam_box.separator()
                 cam_box.label(text="Preview:", icon='RESTRICT_VIEW_OFF')
     
-                prefix = "nb_tex_cam_"
-                view_names = sorted(
-                    o.name[len(prefix):]
-                    for o in bpy.data.objects
-                    if o.name.startswith(prefix)
-                )
-    
                 # 3 buttons per row
                 for i in range(0, len(view_names), 3):
                     row = cam_box.row(align=True)
@@ -1040,10 +1187,11 @@ class BananaPTTexturingNpanel(Panel):
         if props.tex_render_mode == 'MIST':
             depth_box = layout.box()
             depth_head = depth_box.row()
-            icon = 'TRIA_DOWN' if props.tex_ui_show_depth_setup else 'TRIA_RIGHT'
+            show_depth = props.tex_ui_show_depth_setup
+            icon = 'TRIA_DOWN' if show_depth else 'TRIA_RIGHT'
             depth_head.prop(props, "tex_ui_show_depth_setup", icon=icon, text="Depth Settings (Mist Pass)", emboss=False)
             
-            if props.tex_ui_show_depth_setup:
+            if show_depth:
                 depth_box.separator()
                 col = depth_box.column(align=True)
                 col.prop(props, "tex_depth_start", text="Start")
@@ -1057,14 +1205,16 @@ class BananaPTTexturingNpanel(Panel):
             layout.separator()
 
         # ═══════════════ Generation ═══════════════
-        has_cams = any(o.name.startswith("nb_tex_cam_") for o in bpy.data.objects)
+        is_processing = props.tex_is_processing
         if has_cams:
             # Draft button
             col = layout.column()
             col.scale_y = 1.4
-            col.enabled = not props.tex_is_processing
+            col.enabled = not is_processing
             col.operator("banana.texture_draft",
                          text="Generate Texture", icon='BRUSH_DATA')
+            if is_processing:
+                layout.operator("banana.cancel_tex", text="Cancel", icon='CANCEL')
 
             # Cost hint
             if not is_direct_api:
@@ -1083,19 +1233,16 @@ class BananaPTTexturingNpanel(Panel):
             row.operator("banana.cleanup_tex", text="Cleanup", icon='TRASH')
 
         # ── Status bar ──
-        if props.tex_status:
+        tex_status = props.tex_status
+        if tex_status:
             layout.separator()
             box = layout.box()
-            icon = 'TIME' if props.tex_is_processing else 'INFO'
-            box.label(text=props.tex_status, icon=icon)
+            icon = 'TIME' if is_processing else 'INFO'
+            box.label(text=tex_status, icon=icon)
 
 
 def _get_cost_per_request_ui(props) -> int:
     """Calculate cost per request for UI display."""
     model_tier = 'pro' if props.ai_model == 'NANO_BANANA_PRO' else 'flash'
-    cost_grid = {
-        'flash': {'1024': 10, '2048': 15, '4096': 60},
-        'pro':   {'1024': 30, '2048': 45, '4096': 60},
-    }
     res = getattr(props, 'tex_resolution', '1024')
-    return cost_grid.get(model_tier, cost_grid['pro']).get(res, 30)
+    return _COST_GRID[model_tier].get(res, 30)
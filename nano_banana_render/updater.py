@@ -79,16 +79,18 @@ class NanodeOTInstallUpdate(bpy.types.Operator):
         return {'FINISHED'}
 
 
+_UPDATE_ACTION_ITEMS = (
+    ('UPDATE', "Update Now", ""),
+    ('IGNORE', "Ignore", ""),
+    ('DEFER', "Defer", ""),
+)
+
 class NanodeOTUpdateDialog(bpy.types.Operator):
     bl_idname = "nanode.update_dialog"
     bl_label = "Update Nanode add-on"
     
     action: bpy.props.EnumProperty(
-        items=[
-            ('UPDATE', "Update Now", ""),
-            ('IGNORE', "Ignore", ""),
-            ('DEFER', "Defer", "")
-        ],
+        items=_UPDATE_ACTION_ITEMS,
         name="Action",
         default='UPDATE'
     )